@@ -6,11 +6,33 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 # 🔹 Import service and db helpers
+from app.core.config import get_settings
+from app.core.sse import SSE_HEADERS, token_stream
 from app.services.openrouter_service import get_chat_response_stream
-from db.db_helper import get_contract_context
+from db.repository import get_contract_repository
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
+settings = get_settings()
+contracts_repo = get_contract_repository()
+
+# Per-intent instructions; constant strings keep the prompt prefix cacheable
+EMAIL_INSTRUCTION = (
+    "You are a Senior Automotive Negotiation Expert. "
+    "Draft a professional, firm, and persuasive email to a car dealership. "
+    "Use the provided context to point out specific discrepancies, high interest rates, "
+    "or unnecessary 'junk fees'. Use a professional email format with placeholders like [Your Name]."
+)
+DOCUMENT_INSTRUCTION = (
+    "You are LeaseIQ Expert. You have access to the user's uploaded lease contract. "
+    "Provide a detailed, helpful, and analytical response based on the document. "
+    "Use Markdown (bolding, lists) to highlight key financial terms."
+)
+NO_DOCUMENT_INSTRUCTION = (
+    "You are LeaseIQ Expert. No document has been uploaded yet. "
+    "Explain that you need a lease PDF to provide a full analysis, but you can "
+    "still answer general questions about leasing, APR, or residual values."
+)
 
 class ChatRequest(BaseModel):
     message: str
@@ -20,7 +42,9 @@ class ChatRequest(BaseModel):
 @router.post("/chat")
 async def chat_with_lease_expert(request: ChatRequest):
     """
-    Standard Chat: Retrieves context using the filename/ID and streams the response.
+    Standard Chat: Retrieves context using the filename/ID and streams the response
+    as server-sent events: `token` events carrying {"delta": ...}, then `done`
+    (or `error` with {"message": ...}).
     """
     context_text = ""
     
@@ -32,8 +56,8 @@ async def chat_with_lease_expert(request: ChatRequest):
     # 2. Fetch context from DB
     if actual_id_or_filename:
         try:
-            # FIX: get_contract_context should be able to handle both numeric IDs and filenames
-            db_data = get_contract_context(actual_id_or_filename)
+            # find() handles both numeric IDs and filenames
+            db_data = await contracts_repo.find(actual_id_or_filename, include_text=True)
             
             if db_data:
                 logger.info(f"✅ Context Loaded for: {actual_id_or_filename}")
@@ -59,52 +83,30 @@ async def chat_with_lease_expert(request: ChatRequest):
             logger.error(f"❌ Database Retrieval Error: {e}")
 
     # 3. Streaming Logic
-    async def stream_generator():
-        try:
-            # Enhanced Personas for ChatGPT-style responses
-            if request.intent == "email":
-                system_instruction = (
-                    "You are a Senior Automotive Negotiation Expert. "
-                    "Draft a professional, firm, and persuasive email to a car dealership. "
-                    "Use the provided context to point out specific discrepancies, high interest rates, "
-                    "or unnecessary 'junk fees'. Use a professional email format with placeholders like [Your Name]."
-                )
-            elif context_text:
-                system_instruction = (
-                    "You are LeaseIQ Expert. You have access to the user's uploaded lease contract. "
-                    "Provide a detailed, helpful, and analytical response based on the document. "
-                    "Use Markdown (bolding, lists) to highlight key financial terms."
-                )
-            else:
-                system_instruction = (
-                    "You are LeaseIQ Expert. No document has been uploaded yet. "
-                    "Explain that you need a lease PDF to provide a full analysis, but you can "
-                    "still answer general questions about leasing, APR, or residual values."
-                )
-            
-            # Stream response from OpenRouter/Gemini
-            async for chunk in get_chat_response_stream(
-                request.message, 
-                context=context_text, 
-                system_prompt=system_instruction
-            ):
-                if chunk:
-                    yield chunk
-                    
-        except Exception as e:
-            logger.error(f"❌ Chat stream error: {e}")
-            # Ensure we yield a valid JSON-like string if that's what your frontend expects
-            yield '{"assistant_message": "I encountered an error processing the chat. Please try again."}'
-
+    # Enhanced Personas for ChatGPT-style responses
+    if request.intent == "email":
+        system_instruction = EMAIL_INSTRUCTION
+    elif context_text:
+        system_instruction = DOCUMENT_INSTRUCTION
+    else:
+        system_instruction = NO_DOCUMENT_INSTRUCTION
+
+    # Stream response from the routed provider
+    deltas = get_chat_response_stream(
+        request.message, 
+        context=context_text, 
+        system_prompt=system_instruction
+    )
     return StreamingResponse(
-        stream_generator(), 
+        token_stream(
+            deltas,
+            flush_ms=settings.CHAT_STREAM_FLUSH_MS,
+            flush_chars=settings.CHAT_STREAM_FLUSH_CHARS,
+            heartbeat_seconds=settings.SSE_HEARTBEAT_SECONDS,
+            error_message="I encountered an error processing the chat. Please try again."
+        ),
         media_type="text/event-stream",
-        headers={
-            "Content-Type": "text/event-stream",
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no" 
-        }
+        headers=SSE_HEADERS
     )
 
 
@@ -1,12 +1,15 @@
 import os
 import logging
 import json
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import List
 
 # Internal Imports
-from db.db_helper import get_db_connection
-from app.services.groq_client import analyze_contract_text, generate_chat_reply
+from db.repository import get_contract_repository
+from app.core.config import get_settings
+from app.core.disconnect import run_until_disconnect
+from app.core.singleflight import SingleFlight
+from app.services.groq_client import ANALYSIS_VERSION, analyze_contract_text, generate_chat_reply
 # We keep compute_fairness imported just in case, but prioritize DB score
 from app.services.fairness import compute_fairness  
 from .schemas import (
@@ -22,32 +25,44 @@ from .schemas import (
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
-def fetch_contract_by_id_or_name(file_id: str):
-    """Helper to find contract even if the ID is a filename string."""
-    conn = get_db_connection()
-    conn.row_factory = lambda cursor, row: dict(zip([col[0] for col in cursor.description], row))
-    cursor = conn.cursor()
-    
-    query = "SELECT * FROM contracts WHERE id = ? OR file_name = ?"
-    cursor.execute(query, (file_id, file_id))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+# Concurrent /analyze calls for one contract share a single Groq call
+_analysis_flights = SingleFlight("analysis")
+
+# find() accepts an ID or a filename string
+contracts_repo = get_contract_repository()
 
 @router.post("/contracts/{file_id}/analyze", response_model=AnalysisResponse)
-async def analyze_contract(file_id: str):
+async def analyze_contract(file_id: str, http_request: Request, refresh: bool = False):
     """
     Fetches the LOCKED score from the DB to ensure matching results 
     between Summary Panel and Negotiation UI.
+    The Groq analysis is stored per contract and reused; refresh=true reruns it.
     """
-    contract = fetch_contract_by_id_or_name(file_id)
+    contract = await contracts_repo.find(file_id)
     if not contract:
         raise HTTPException(status_code=404, detail=f"Contract {file_id} not found.")
 
     try:
         # 1. AI Extraction (Still needed for the Risk/Fee list UI)
-        raw_ai_data = analyze_contract_text(contract.get("contract_text", ""))
+        raw_ai_data = None
+        if not refresh:
+            raw_ai_data = await contracts_repo.get_analysis(contract["id"], ANALYSIS_VERSION)
+        if raw_ai_data is None:
+            async def _analyze():
+                contract_text = await contracts_repo.get_text(contract["id"])
+                result = await analyze_contract_text(contract_text)
+                # An empty answer is usually a parse failure; don't pin it
+                if result.get("risk_factors") or result.get("hidden_fees"):
+                    await contracts_repo.save_analysis(contract["id"], ANALYSIS_VERSION, result)
+                return result
+
+            raw_ai_data = await run_until_disconnect(
+                http_request,
+                _analysis_flights.do(f"{contract['id']}:{ANALYSIS_VERSION}", _analyze),
+                timeout=settings.GROQ_TIMEOUT_SECONDS
+            )
         
         # 2. Get Data from DB
         db_score = int(contract.get("score") or 0)
@@ -83,12 +98,14 @@ async def analyze_contract(file_id: str):
             junk_fees=junk_fees_list
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Analysis failed for {file_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Deep Analysis failed: {str(e)}")
 @router.post("/contracts/{file_id}/chat", response_model=ChatResponse)
-async def negotiation_chat(file_id: str, request: ChatRequest):
-    contract = fetch_contract_by_id_or_name(file_id)
+async def negotiation_chat(file_id: str, request: ChatRequest, http_request: Request):
+    contract = await contracts_repo.find(file_id)
     if not contract:
         raise HTTPException(status_code=404, detail="Contract context missing.")
 
@@ -129,7 +146,11 @@ async def negotiation_chat(file_id: str, request: ChatRequest):
         )
 
         # 5. Generate AI Draft
-        ai_response = generate_chat_reply(analysis_payload, request)
+        ai_response = await run_until_disconnect(
+            http_request,
+            generate_chat_reply(analysis_payload, request),
+            timeout=settings.GROQ_TIMEOUT_SECONDS
+        )
         
         # Ensure counter_email_draft is actually returned to the frontend
         return ChatResponse(
@@ -137,6 +158,8 @@ async def negotiation_chat(file_id: str, request: ChatRequest):
             counter_email_draft=ai_response.get("counter_email_draft")
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Negotiation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed: {str(e)}")
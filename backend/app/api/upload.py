@@ -1,125 +1,77 @@
 import os
+import uuid
+import hashlib
 import logging
 import aiofiles
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from app.core.config import get_settings
+from app.core.sse import HEARTBEAT, SSE_HEADERS, sse_event
 
-# 🔹 Services & DB Helpers
-from app.services.ocr_service import extract_text_from_pdf
-from app.services.openrouter_service import extract_contract_info 
-from app.services.pricing_service import calculate_fairness
-from db.db_helper import save_contract_to_db
+# 🔹 Services
+from app.services.contract_pipeline import process_contract
+from app.services import upload_jobs
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/upload")
-async def handle_upload(
-    file: UploadFile = File(...),
-    settings=Depends(get_settings)
-):
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+async def _save_upload(file: UploadFile, settings) -> tuple[str, str]:
+    """
+    Streams the upload to disk in fixed-size chunks, hashing on the fly, so
+    memory per upload stays at one chunk. Returns (file_path, sha256).
+    Every upload gets its own file, so same-named uploads (or a re-upload
+    while a job is still reading the first) never touch each other's bytes.
+    """
     # 1. Validate File Type
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported.")
 
     # Ensure upload directory exists
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
+    file_path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}")
+
+    # 2. Save File Asynchronously
+    logger.info(f"Saving file to: {file_path}")
+    max_bytes = settings.UPLOAD_MAX_MB * 1024 * 1024
+    digest = hashlib.sha256()
+    written = 0
+    async with aiofiles.open(file_path, 'wb') as out_file:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            written += len(chunk)
+            if written > max_bytes:
+                break
+            digest.update(chunk)
+            await out_file.write(chunk)
+
+    if written > max_bytes:
+        os.remove(file_path)
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {settings.UPLOAD_MAX_MB} MB limit.")
+    return file_path, digest.hexdigest()
 
+
+@router.post("/upload")
+async def handle_upload(
+    file: UploadFile = File(...),
+    refresh: bool = False,
+    settings=Depends(get_settings)
+):
     try:
-        # 2. Save File Asynchronously
-        logger.info(f"Saving file to: {file_path}")
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            content = await file.read()
-            await out_file.write(content)
-
-        # 3. Perform OCR
-        logger.info(f"Step 1: Starting OCR for {file.filename}...")
-        extracted_text = extract_text_from_pdf(file_path)
-        
-        if not extracted_text or len(extracted_text.strip()) < 20:
-            raise ValueError("OCR failed to read the document. Ensure the PDF contains text.")
-
-        # 4. AI Data Extraction
-        logger.info(f"Step 2: AI Extracting detailed data for {file.filename}...")
-        contract_data = await extract_contract_info(extracted_text)
-
-        # 4.5 Data Sanitization (CRITICAL for Database Stability & Scoring)
-        # We ensure all fields expected by fairness.py and the DB are present.
-        sanitized_data = {
-            "purchasePrice": float(contract_data.get("purchasePrice") or 0),
-            "aprPercent": float(contract_data.get("aprPercent") or 0),
-            "leaseTermMonths": int(contract_data.get("leaseTermMonths") or 0),
-            "monthlyPaymentINR": float(contract_data.get("monthlyPaymentINR") or 0),
-            "downPaymentINR": float(contract_data.get("downPaymentINR") or 0),
-            "residualValueINR": float(contract_data.get("residualValueINR") or 0),
-            "earlyTerminationLevel": contract_data.get("earlyTerminationLevel") or "Medium",
-            "maintenanceType": contract_data.get("maintenanceType") or "Customer",
-            "warrantyType": contract_data.get("warrantyType") or "Not Included",
-            "penaltyLevel": contract_data.get("penaltyLevel") or "Medium",
-            "make": contract_data.get("make") or "Unknown",
-            "model": contract_data.get("model") or "Vehicle",
-            "year": contract_data.get("year") or "N/A",
-            "vin": contract_data.get("vin") or "N/A",
-            "junk_fees": contract_data.get("junk_fees") or []
-        }
-        # Update the main contract_data with sanitized values
-        contract_data.update(sanitized_data)
-
-        # 5. Calculate Fairness Score (Using your strict fairness.py logic)
-        logger.info(f"Step 3: Calculating fairness score...")
-        analysis = calculate_fairness(contract_data) 
-        final_score = analysis.get("fairness_score", 0)
-        
-        # 6. Save to Database
-        # 🔹 IMPORTANT: Convert junk_fees list to a string for DB storage
-        junk_fees_list = contract_data.get("junk_fees", [])
-        junk_fees_string = ", ".join(junk_fees_list) if isinstance(junk_fees_list, list) else str(junk_fees_list)
-
-        file_id = None
-        try:
-            # save_contract_to_db returns the integer ID from SQL
-            # We pass the score and the sanitized data to ensure consistency.
-            db_id = save_contract_to_db(
-                file_name=file.filename,
-                contract_text=extracted_text, 
-                extraction_data={
-                    **contract_data,
-                    "junk_fees": junk_fees_string # Store as comma-separated string
-                },
-                score=final_score # Lock the score here!
-            )
-            
-            if db_id:
-                file_id = str(db_id)
-                logger.info(f"✅ SUCCESS: Saved with DB ID: {file_id} and Score: {final_score}")
-            else:
-                file_id = file.filename
-            
-        except Exception as db_err:
-            logger.error(f"❌ DATABASE ERROR: {db_err}")
-            file_id = file.filename
-
-        # 7. Final Response
-# 7. Final Response - Updated to match React's "summary.fairness.score" path
-        return {
-            "status": "success",
-            "file_id": file_id,
-            "filename": file.filename,
-            "data": {
-                **contract_data,
-                "fairness": {
-                    "score": final_score,
-                    "rating": "Unfair" if final_score < 40 else "Moderate" if final_score < 75 else "Fair",
-                    "explanation": "Initial audit complete."
-                }
-            }
-        }
+        file_path, content_hash = await _save_upload(file, settings)
+
+        # 3. OCR -> AI Extraction -> Scoring -> DB
+        # refresh=true skips cached AI extraction results
+        return await process_contract(file_path, file.filename, content_hash=content_hash, refresh=refresh)
+
+    except HTTPException:
+        raise
 
     except ValueError as ve:
         logger.warning(f"Validation Error: {str(ve)}")
         raise HTTPException(status_code=422, detail=str(ve))
-        
+
     except Exception as e:
         logger.error(f"Critical Pipeline Failure: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -128,6 +80,65 @@ async def handle_upload(
         )
 
 
+@router.post("/upload/jobs", status_code=202)
+async def submit_upload_job(
+    file: UploadFile = File(...),
+    refresh: bool = False,
+    settings=Depends(get_settings)
+):
+    """
+    Async mode: saves the PDF and returns a job id immediately. The pipeline
+    runs on the background worker pool; poll the job or stream its events.
+    """
+    file_path, content_hash = await _save_upload(file, settings)
+    try:
+        job = upload_jobs.submit_job(file_path, file.filename, content_hash=content_hash, refresh=refresh)
+    except upload_jobs.QueueFullError as e:
+        # The client will retry with a fresh upload; don't leave this copy behind
+        os.remove(file_path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    return {"job_id": job.job_id, "status": job.status, "filename": file.filename}
+
+
+@router.get("/upload/jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    job = upload_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job.to_dict()
+
+
+@router.get("/upload/jobs/{job_id}/events")
+async def stream_upload_job(job_id: str):
+    """Server-sent events for each stage transition, ending with done (then result) or failed {"error": ...}."""
+    job = upload_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+
+    heartbeat = get_settings().SSE_HEARTBEAT_SECONDS
+
+    async def event_generator():
+        sent = 0
+        while True:
+            while sent < len(job.events):
+                event = job.events[sent]
+                sent += 1
+                yield sse_event(event, event["stage"])
+                if event["stage"] in upload_jobs.FINISHED:
+                    if event["stage"] == "done":
+                        yield sse_event(job.result, "result")
+                    return
+            if not await job.wait_for_change(timeout=heartbeat):
+                yield HEARTBEAT
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
 
 
 
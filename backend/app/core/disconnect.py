@@ -0,0 +1,37 @@
+import asyncio
+import logging
+from typing import Awaitable, TypeVar
+
+from fastapi import HTTPException, Request
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+async def run_until_disconnect(
+    request: Request, awaitable: Awaitable[T], timeout: float, poll_interval: float = 0.5
+) -> T:
+    """
+    Awaits an upstream call while watching the client connection.
+    The call is cancelled if the client goes away (HTTP 499) or the call
+    outlives timeout seconds (HTTP 504), so abandoned requests stop holding
+    provider slots and connections.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise HTTPException(status_code=504, detail="The AI provider took too long to respond.")
+            done, _ = await asyncio.wait({task}, timeout=min(poll_interval, remaining))
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected, cancelling {request.url.path}")
+                raise HTTPException(status_code=499, detail="Client closed request.")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,61 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.core.config import get_settings
+
+T = TypeVar("T")
+
+_executor = None
+_db_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """
+    Dedicated pool for blocking work (subprocess OCR, caches, sync SDKs).
+    Kept separate from the default loop executor so a burst of uploads
+    cannot starve anything else that relies on it.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, get_settings().BLOCKING_WORKERS),
+                thread_name_prefix="blocking"
+            )
+        return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs a synchronous callable off the event loop and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_blocking_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """
+    Small pool reserved for database calls. Each thread keeps its own pooled
+    connection, and a queue of OCR work on the blocking pool never delays
+    a chat's contract lookup.
+    """
+    global _db_executor
+    with _executor_lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(
+                max_workers=max(1, get_settings().DB_WORKERS),
+                thread_name_prefix="db"
+            )
+        return _db_executor
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs a synchronous database call on the DB pool and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_db_executor(), functools.partial(func, *args, **kwargs)
+    )
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    # orjson encodes straight to bytes and is several times faster per event
+    import orjson
+
+    def _dumps(data: Any) -> bytes:
+        return orjson.dumps(data)
+except ImportError:
+    orjson = None
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def _dumps(data: Any) -> bytes:
+        return _encoder.encode(data).encode()
+
+# Comment line; keeps proxies from closing an idle stream
+HEARTBEAT = b": keep-alive\n\n"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+_DONE = object()
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> bytes:
+    """Frames one server-sent event. JSON never contains raw newlines, so one data: line suffices."""
+    head = b"event: " + event.encode() + b"\n" if event else b""
+    return head + b"data: " + _dumps(data) + b"\n\n"
+
+
+async def token_stream(
+    deltas: AsyncIterator[str],
+    flush_ms: int = 0,
+    flush_chars: int = 0,
+    heartbeat_seconds: float = 15,
+    error_message: str = "The response was interrupted. Please try again.",
+) -> AsyncIterator[bytes]:
+    """
+    Turns an async iterator of text deltas into SSE frames:
+      event: token  data: {"delta": "..."}   one or more deltas, batched
+      event: done   data: {}
+      event: error  data: {"message": "..."}
+    plus heartbeat comments while the model is silent. With flush_ms > 0,
+    deltas are held until flush_ms has passed since the first unsent one or
+    flush_chars characters are pending, cutting per-token frames and writes.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for delta in deltas:
+                if delta:
+                    await queue.put(delta)
+            await queue.put(_DONE)
+        except Exception as e:
+            await queue.put(e)
+
+    loop = asyncio.get_running_loop()
+    producer = asyncio.create_task(pump())
+    pending, pending_chars, flush_at = [], 0, None
+    try:
+        while True:
+            timeout = heartbeat_seconds if flush_at is None else max(0.0, flush_at - loop.time())
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                if pending:
+                    yield sse_event({"delta": "".join(pending)}, "token")
+                    pending, pending_chars, flush_at = [], 0, None
+                else:
+                    yield HEARTBEAT
+                continue
+
+            if isinstance(item, str):
+                pending.append(item)
+                pending_chars += len(item)
+                if flush_ms <= 0 or pending_chars >= flush_chars > 0:
+                    yield sse_event({"delta": "".join(pending)}, "token")
+                    pending, pending_chars, flush_at = [], 0, None
+                elif flush_at is None:
+                    flush_at = loop.time() + flush_ms / 1000
+                continue
+
+            if pending:
+                yield sse_event({"delta": "".join(pending)}, "token")
+            if item is _DONE:
+                yield sse_event({}, "done")
+            else:
+                logger.error(f"Token stream failed: {item}")
+                yield sse_event({"message": error_message}, "error")
+            return
+    finally:
+        producer.cancel()
@@ -0,0 +1,45 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects upload bodies over max_bytes before they are spooled.
+    A declared Content-Length is checked up front; chunked bodies are counted
+    as they arrive and aborted as soon as they cross the limit.
+    """
+
+    def __init__(self, app, max_bytes: int, path_prefix: str = "/api/upload"):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Upload exceeds the {self.max_bytes // (1024 * 1024)} MB limit."
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse(status_code=413, content={"detail": detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing, so FastAPI turns it into the response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
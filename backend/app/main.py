@@ -23,14 +23,19 @@ if APP_DIR not in sys.path:
     sys.path.append(APP_DIR)
 
 # 2. Clean Imports
+from app.core.config import get_settings
+from app.core.upload_limits import UploadSizeLimitMiddleware
+from app.services.llm_router import router_metrics
+from app.services.llm_transport import close_http_clients, transport_metrics
+
 try:
     from api import upload, chat, market, contracts 
-    from db.db_helper import init_db
+    from db.repository import get_contract_repository
 except ImportError as e:
     logging.error(f"Import failed: {e}")
     # Fallback for alternative execution environments
     from app.api import upload, chat, market, contracts 
-    from db.db_helper import init_db
+    from db.repository import get_contract_repository
 
 app = FastAPI(title="LeaseIQ Integrated API")
 
@@ -49,6 +54,13 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
 
+# Caps upload bodies before Starlette spools them (see UPLOAD_MAX_MB).
+# Added before CORS so CORS wraps it and the browser can read its 413s.
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=get_settings().UPLOAD_MAX_MB * 1024 * 1024,
+)
+
 # 4. CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -79,14 +91,18 @@ def read_root():
 def health_check():
     # Check if Groq Key is loaded for debugging (don't reveal the key itself)
     groq_status = "Loaded" if os.getenv("GROQ_API_KEY") else "Missing"
-    return {"status": "healthy", "groq_key": groq_status}
+    return {"status": "healthy", "groq_key": groq_status, "llm": transport_metrics(), "llm_routes": router_metrics()}
 
 @app.on_event("startup")
 async def startup_event():
     uploads_dir = os.path.join(BASE_DIR, "uploads")
     if not os.path.exists(uploads_dir):
         os.makedirs(uploads_dir)
-    init_db()
+    get_contract_repository().init_schema()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_http_clients()
     
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import get_settings
+from app.core.executors import run_blocking
+from app.core.singleflight import SingleFlight
+from app.services.ocr_service import extract_pages_from_pdf
+from app.services.openrouter_service import extract_contract_info
+from app.services.pricing_service import calculate_fairness
+from app.services.text_processing import has_key_financial_terms
+from db.repository import get_contract_repository
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+contracts_repo = get_contract_repository()
+
+# Caps how many uploads run their blocking stages at once; the rest wait
+# here without holding a worker thread.
+_pipeline_slots = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+
+# The same PDF uploaded from several tabs is OCR'd once
+_ocr_flights = SingleFlight("ocr")
+
+ProgressCallback = Callable[..., None]
+
+
+def _no_progress(stage: str, **info: Any):
+    pass
+
+
+def _enough_for_extraction(text: str) -> bool:
+    """
+    Early-stop rule for OCR: the extractor only reads the first
+    OCR_EARLY_STOP_CHARS characters, and once every key financial term has
+    shown up the remaining pages are mostly boilerplate.
+    """
+    return len(text) >= settings.OCR_EARLY_STOP_CHARS or has_key_financial_terms(text)
+
+
+async def process_contract(
+    file_path: str,
+    filename: str,
+    content_hash: Optional[str] = None,
+    report: Optional[ProgressCallback] = None,
+    refresh: bool = False,
+) -> Dict[str, Any]:
+    """
+    Runs a saved PDF through OCR -> AI extraction -> scoring -> DB insert and
+    returns the upload response payload. content_hash is the SHA-256 computed
+    while saving, which spares OCR a second pass over the file for its cache
+    key. report(stage, **info) is called at each stage transition; it may be
+    called from OCR worker threads. refresh=True bypasses the extraction cache.
+    Raises ValueError when the document has no readable text.
+    """
+    report = report or _no_progress
+
+    # 1. Perform OCR (subprocess-bound, so it runs off the event loop)
+    logger.info(f"Step 1: Starting OCR for {filename}...")
+
+    async def _ocr():
+        async with _pipeline_slots:
+            return await run_blocking(
+                extract_pages_from_pdf, file_path,
+                content_hash=content_hash,
+                on_page=lambda done, total: report("ocr", page=done, pages=total),
+                stop_when=_enough_for_extraction if settings.OCR_EARLY_STOP else None
+            )
+
+    # Coalesced uploads only see per-page progress on the first caller
+    ocr_result = await (_ocr_flights.do(content_hash, _ocr) if content_hash else _ocr())
+    extracted_text = ocr_result["text"]
+
+    if not extracted_text or len(extracted_text.strip()) < 20:
+        raise ValueError("OCR failed to read the document. Ensure the PDF contains text.")
+
+    # 2. AI Data Extraction
+    logger.info(f"Step 2: AI Extracting detailed data for {filename}...")
+    contract_data = await extract_contract_info(extracted_text, use_cache=not refresh)
+    report("extracted")
+
+    # 2.5 Data Sanitization (CRITICAL for Database Stability & Scoring)
+    # We ensure all fields expected by fairness.py and the DB are present.
+    sanitized_data = {
+        "purchasePrice": float(contract_data.get("purchasePrice") or 0),
+        "aprPercent": float(contract_data.get("aprPercent") or 0),
+        "leaseTermMonths": int(contract_data.get("leaseTermMonths") or 0),
+        "monthlyPaymentINR": float(contract_data.get("monthlyPaymentINR") or 0),
+        "downPaymentINR": float(contract_data.get("downPaymentINR") or 0),
+        "residualValueINR": float(contract_data.get("residualValueINR") or 0),
+        "earlyTerminationLevel": contract_data.get("earlyTerminationLevel") or "Medium",
+        "maintenanceType": contract_data.get("maintenanceType") or "Customer",
+        "warrantyType": contract_data.get("warrantyType") or "Not Included",
+        "penaltyLevel": contract_data.get("penaltyLevel") or "Medium",
+        "make": contract_data.get("make") or "Unknown",
+        "model": contract_data.get("model") or "Vehicle",
+        "year": contract_data.get("year") or "N/A",
+        "vin": contract_data.get("vin") or "N/A",
+        "junk_fees": contract_data.get("junk_fees") or []
+    }
+    # Update the main contract_data with sanitized values
+    contract_data.update(sanitized_data)
+
+    # 3. Calculate Fairness Score (Using your strict fairness.py logic)
+    logger.info(f"Step 3: Calculating fairness score...")
+    analysis = calculate_fairness(contract_data)
+    final_score = analysis.get("fairness_score", 0)
+    report("scored", score=final_score)
+
+    # 4. Save to Database
+    # 🔹 IMPORTANT: Convert junk_fees list to a string for DB storage
+    junk_fees_list = contract_data.get("junk_fees", [])
+    junk_fees_string = ", ".join(junk_fees_list) if isinstance(junk_fees_list, list) else str(junk_fees_list)
+
+    file_id = None
+    try:
+        # save() returns the new row ID as a string
+        # We pass the score and the sanitized data to ensure consistency.
+        db_id = await contracts_repo.save(
+            file_name=filename,
+            contract_text=extracted_text,
+            extraction_data={
+                **contract_data,
+                "junk_fees": junk_fees_string # Store as comma-separated string
+            },
+            score=final_score # Lock the score here!
+        )
+
+        if db_id:
+            file_id = str(db_id)
+            logger.info(f"✅ SUCCESS: Saved with DB ID: {file_id} and Score: {final_score}")
+        else:
+            file_id = filename
+
+    except Exception as db_err:
+        logger.error(f"❌ DATABASE ERROR: {db_err}")
+        file_id = filename
+    report("stored", file_id=file_id)
+
+    # 5. Final Response - matches React's "summary.fairness.score" path
+    return {
+        "status": "success",
+        "file_id": file_id,
+        "filename": filename,
+        "data": {
+            **contract_data,
+            "fairness": {
+                "score": final_score,
+                "rating": "Unfair" if final_score < 40 else "Moderate" if final_score < 75 else "Fair",
+                "explanation": "Initial audit complete."
+            }
+        },
+        # Per-page extraction path and timings for latency tracking
+        "ocr": {
+            "cache": ocr_result["cache"],
+            "seconds": ocr_result["seconds"],
+            "page_total": ocr_result.get("page_total", len(ocr_result["pages"])),
+            "stopped_early": ocr_result.get("stopped_early", False),
+            "text_layer_pages": ocr_result["text_layer_pages"],
+            "ocr_pages": ocr_result["ocr_pages"],
+            "pages": ocr_result["pages"]
+        }
+    }
@@ -2,14 +2,37 @@ import logging
 from google import genai
 from google.genai import types
 from app.core.config import get_settings
+from app.services.llm_transport import get_limiter
 
 # Setup logging for production debugging
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# 1️⃣ Initialize the official Client
-# It automatically picks up GEMINI_API_KEY from your environment variables
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+MODEL_NAME = "gemini-1.5-flash"
+_limiter = get_limiter("gemini")
+_client = None
+
+# 1️⃣ Initialize the official Client lazily; genai.Client refuses to start
+# without a key, and this module is imported even when Gemini is unused
+def get_client():
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=settings.GEMINI_API_KEY)
+    return _client
+
+async def complete_json(system_prompt: str, prompt: str) -> str:
+    """One JSON-mode completion for llm_router; returns the raw response text."""
+    async with _limiter.slot():
+        response = await get_client().aio.models.generate_content(
+            model=MODEL_NAME,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                system_instruction=system_prompt,
+                response_mime_type="application/json",
+                temperature=0,
+            )
+        )
+    return response.text
 
 async def send_message_to_gemini(message: str, context: str = ""):
     """
@@ -33,11 +56,13 @@ async def send_message_to_gemini(message: str, context: str = ""):
 
     try:
         # 4️⃣ Generate Content (Supports 1.5 Flash for speed)
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=user_content,
-            config=config
-        )
+        # client.aio keeps the request off the event loop thread
+        async with _limiter.slot():
+            response = await get_client().aio.models.generate_content(
+                model=MODEL_NAME,
+                contents=user_content,
+                config=config
+            )
 
         # 5️⃣ Robust response parsing
         if response.text:
@@ -58,16 +83,17 @@ async def stream_message_to_gemini(message: str, context: str = ""):
     
     try:
         # Using generate_content_stream for real-time output
-        stream = client.models.generate_content_stream(
-            model="gemini-1.5-flash",
-            contents=user_content,
-            config=types.GenerateContentConfig(
-                system_instruction="You are LeaseIQ AI, an expert negotiator."
+        async with _limiter.slot():
+            stream = await get_client().aio.models.generate_content_stream(
+                model=MODEL_NAME,
+                contents=user_content,
+                config=types.GenerateContentConfig(
+                    system_instruction="You are LeaseIQ AI, an expert negotiator."
+                )
             )
-        )
-        for chunk in stream:
-            if chunk.text:
-                yield chunk.text
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
     except Exception as e:
         logger.error(f"Streaming Error: {str(e)}")
         yield "Error: Connection lost."
\ No newline at end of file
@@ -9,26 +9,73 @@ from typing import Any, Dict, List
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
-from groq import Groq, APIStatusError
+from groq import AsyncGroq, APIStatusError
 from ..api import schemas
+from ..core.config import get_settings
+from .llm_transport import get_async_http_client, get_limiter, record_prompt_usage
+from .text_processing import CHARS_PER_TOKEN, estimate_tokens, select_financial_pages
 
 # -------------------------------
 # Logging & Client Setup
 # -------------------------------
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
+settings = get_settings()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     logger.warning("GROQ_API_KEY is not set. Groq calls will fail.")
 
-client = Groq(api_key=GROQ_API_KEY)
+client = AsyncGroq(api_key=GROQ_API_KEY, http_client=get_async_http_client())
 MODEL_NAME = "llama-3.1-8b-instant"
+# Bump when the analysis prompt changes; stored analyses from other
+# versions are recomputed on the next /analyze call
+ANALYSIS_PROMPT_VERSION = 2
+ANALYSIS_VERSION = f"{MODEL_NAME}:v{ANALYSIS_PROMPT_VERSION}"
+ANALYSIS_MAX_OUTPUT_TOKENS = 2048
+_limiter = get_limiter("groq")
+
+# -------------------------------
+# Router entry points (see llm_router)
+# -------------------------------
+async def complete_json(system_prompt: str, prompt: str) -> str:
+    """One JSON-mode completion; returns the raw message content."""
+    async with _limiter.slot():
+        chat_completion = await client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.0,
+        )
+    record_prompt_usage("groq", chat_completion.usage)
+    return chat_completion.choices[0].message.content
+
+
+async def stream_chat(messages: List[Dict[str, str]], temperature: float, max_tokens: int):
+    """Yields text deltas for an OpenAI-style message list."""
+    async with _limiter.slot():
+        stream = await client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=messages,
+            stream=True,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            # Groq reports usage on the last chunk under x_groq
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage:
+                record_prompt_usage("groq", usage)
 
 # -------------------------------
 # Step 1: Extract Structured Data
 # -------------------------------
-def analyze_contract_text(raw_text: str) -> Dict[str, Any]:
+async def analyze_contract_text(raw_text: str) -> Dict[str, Any]:
     """
     Extracts structured lease data with strict accuracy and retry logic.
     """
@@ -58,28 +105,38 @@ RULES:
 3. If text is scrambled OCR noise (e.g., 'E,x,c,e,s,s'), IGNORE IT.
 """
 
-    MAX_CHARS = 10000 
-    truncated_text = raw_text[:MAX_CHARS]
-
-    def _call_llm(text_to_process: str) -> str:
-        chat_completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": system_prompt.strip()},
-                {"role": "user", "content": f"Analyze this contract:\n\n{text_to_process}"},
-            ],
-            temperature=0.0, # Strict deterministic extraction
-            
-        )
+    # Size the prompt before sending instead of waiting for a 413. Output
+    # tokens count against Groq's per-request cap too.
+    user_prefix = "Analyze this contract:\n\n"
+    budget = (
+        settings.token_limit(MODEL_NAME) - ANALYSIS_MAX_OUTPUT_TOKENS
+        - estimate_tokens(system_prompt) - estimate_tokens(user_prefix)
+    )
+    text_to_send = raw_text
+    if estimate_tokens(raw_text) > budget:
+        text_to_send = select_financial_pages(raw_text, budget * CHARS_PER_TOKEN)
+        logger.info(f"Contract trimmed from {len(raw_text)} to {len(text_to_send)} chars for {MODEL_NAME}")
+
+    async def _call_llm(text_to_process: str) -> str:
+        async with _limiter.slot():
+            chat_completion = await client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt.strip()},
+                    {"role": "user", "content": f"{user_prefix}{text_to_process}"},
+                ],
+                temperature=0.0, # Strict deterministic extraction
+                max_tokens=ANALYSIS_MAX_OUTPUT_TOKENS,
+            )
         return chat_completion.choices[0].message.content.strip()
 
     try:
-        response_text = _call_llm(raw_text)
+        response_text = await _call_llm(text_to_send)
     except APIStatusError as e:
-        # Retry with truncation if the file is too large
+        # Safety net for when the estimate undercounts (e.g. dense numeric tables)
         if e.status_code == 413 or "Request too large" in str(e):
-            logger.info("Retrying with truncated text.")
-            response_text = _call_llm(truncated_text)
+            logger.info("Estimate too low, retrying at half the budget.")
+            response_text = await _call_llm(select_financial_pages(raw_text, budget * CHARS_PER_TOKEN // 2))
         else:
             raise e
 
@@ -92,7 +149,7 @@ RULES:
 # -------------------------------
 # Step 2: Generate Negotiation Response
 # -------------------------------
-def generate_chat_reply(
+async def generate_chat_reply(
     analysis: schemas.ContractAnalysisPayload,
     request: schemas.ChatRequest,
 ) -> Dict[str, str]:
@@ -167,16 +224,17 @@ INTENT: email
 """
 
     try:
-        chat_completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": system_prompt.strip()},
-                {"role": "user", "content": user_prompt.strip()},
-            ],
-            temperature=0.0,  # Low temp to reduce hallucinations
-            max_tokens=1200,
-            response_format={"type": "json_object"}
-        )
+        async with _limiter.slot():
+            chat_completion = await client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt.strip()},
+                    {"role": "user", "content": user_prompt.strip()},
+                ],
+                temperature=0.0,  # Low temp to reduce hallucinations
+                max_tokens=1200,
+                response_format={"type": "json_object"}
+            )
 
         raw_res = chat_completion.choices[0].message.content.strip()
 
@@ -0,0 +1,227 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Env var that must be set for a provider to be routable
+PROVIDER_KEYS = {
+    "openrouter": "OPENROUTER_API_KEY",
+    "groq": "GROQ_API_KEY",
+    "gemini": "GEMINI_API_KEY",
+}
+
+# Until a provider has real samples it is assumed to take this long, scaled by
+# its position in the route, so the configured order decides cold starts
+PRIOR_LATENCY_SECONDS = 2.0
+# Failures fade with this half-life so a provider that had a bad minute is
+# eventually tried again
+ERROR_HALF_LIFE_SECONDS = 60.0
+ERROR_PENALTY = 4.0
+MIN_SAMPLES_FOR_PERCENTILE = 10
+
+
+class LLMUnavailableError(Exception):
+    """Raised when every provider on a route failed or none is configured."""
+
+
+class ProviderStats:
+    """Rolling latency samples and a time-decayed error rate for one provider on one task."""
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self._error_rate = 0.0
+        self._error_at = time.monotonic()
+
+    @property
+    def error_rate(self) -> float:
+        elapsed = time.monotonic() - self._error_at
+        return self._error_rate * 0.5 ** (elapsed / ERROR_HALF_LIFE_SECONDS)
+
+    def record(self, seconds: Optional[float] = None, failed: bool = False):
+        self.calls += 1
+        self.failures += failed
+        self._error_rate = 0.8 * self.error_rate + (0.2 if failed else 0.0)
+        self._error_at = time.monotonic()
+        if seconds is not None and not failed:
+            self.latencies.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.latencies) < MIN_SAMPLES_FOR_PERCENTILE:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def median(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+    def to_dict(self) -> Dict[str, Any]:
+        median = self.median()
+        p95 = self.percentile(95)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(median * 1000) if median is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+        }
+
+
+_stats: Dict[str, Dict[str, ProviderStats]] = {}
+
+
+def _stats_for(task: str, provider: str) -> ProviderStats:
+    return _stats.setdefault(task, {}).setdefault(provider, ProviderStats())
+
+
+def is_configured(provider: str) -> bool:
+    key = PROVIDER_KEYS[provider]
+    return bool(getattr(settings, key, None) or os.getenv(key))
+
+
+def rank_providers(task: str, available: List[str]) -> List[str]:
+    """
+    Orders the task's route by expected cost: median latency inflated by
+    recent error rate. Unconfigured providers are dropped.
+    """
+    route = [p for p in settings.LLM_ROUTES.get(task, []) if p in available and is_configured(p)]
+
+    def expected(rank: int, provider: str) -> float:
+        stats = _stats_for(task, provider)
+        latency = stats.median()
+        if latency is None:
+            latency = PRIOR_LATENCY_SECONDS * (rank + 1)
+        return latency * (1 + ERROR_PENALTY * stats.error_rate)
+
+    scored = sorted(enumerate(route), key=lambda item: expected(*item))
+    return [provider for _, provider in scored]
+
+
+def _hedge_delay(task: str, provider: str) -> float:
+    observed = _stats_for(task, provider).percentile(settings.LLM_HEDGE_PERCENTILE)
+    if observed is None:
+        observed = settings.LLM_TIMEOUT_SECONDS / 2
+    return max(settings.LLM_HEDGE_MIN_DELAY_SECONDS, observed)
+
+
+async def _attempt(task: str, provider: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+    stats = _stats_for(task, provider)
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(factory(), settings.LLM_TIMEOUT_SECONDS)
+    except asyncio.CancelledError:
+        # Lost a hedge race or the caller went away; not the provider's fault
+        raise
+    except Exception:
+        stats.record(failed=True)
+        raise
+    stats.record(time.perf_counter() - started)
+    return result
+
+
+async def call(
+    task: str,
+    attempts: Dict[str, Callable[[], Awaitable[Any]]],
+    hedge: bool = False,
+) -> Any:
+    """
+    Runs one request-response LLM call on the best provider for task,
+    failing over down the ranked route on errors and timeouts. With
+    hedge=True, a call still running past the provider's
+    LLM_HEDGE_PERCENTILE latency is raced against the next provider and
+    whichever succeeds first wins.
+    attempts maps provider name -> zero-arg factory returning the awaitable.
+    """
+    order = rank_providers(task, list(attempts))
+    if not order:
+        raise LLMUnavailableError(f"No LLM provider configured for '{task}'.")
+
+    errors = []
+    running = set()
+    next_index = 0
+    try:
+        while next_index < len(order) or running:
+            if not running:
+                provider = order[next_index]
+                running.add(asyncio.create_task(_attempt(task, provider, attempts[provider]), name=provider))
+                next_index += 1
+
+            timeout = None
+            if hedge and len(running) == 1 and next_index < len(order):
+                timeout = _hedge_delay(task, next(iter(running)).get_name())
+
+            done, running = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                provider = order[next_index]
+                logger.info(f"Hedging slow '{task}' call with {provider}")
+                running.add(asyncio.create_task(_attempt(task, provider, attempts[provider]), name=provider))
+                next_index += 1
+                continue
+
+            for finished in done:
+                if finished.exception() is None:
+                    return finished.result()
+                logger.warning(f"{finished.get_name()} failed for '{task}': {finished.exception()!r}")
+                errors.append(f"{finished.get_name()}: {finished.exception()!r}")
+    finally:
+        for pending in running:
+            pending.cancel()
+
+    raise LLMUnavailableError(f"All providers failed for '{task}': {'; '.join(errors)}")
+
+
+async def stream(
+    task: str,
+    attempts: Dict[str, Callable[[], AsyncIterator[str]]],
+) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of call(). Fails over only until the first chunk
+    has been yielded; after that an error is re-raised to the caller since
+    the partial answer cannot be taken back. A stream that ends without any
+    text counts as a failure. Latency is time to first chunk.
+    """
+    order = rank_providers(task, list(attempts))
+    errors = []
+    for provider in order:
+        stats = _stats_for(task, provider)
+        started = time.perf_counter()
+        first = True
+        try:
+            async for piece in attempts[provider]():
+                if not piece:
+                    continue
+                if first:
+                    stats.record(time.perf_counter() - started)
+                    first = False
+                yield piece
+            if first:
+                # Nothing has been sent yet, so failing over is still safe
+                raise LLMUnavailableError(f"{provider} returned an empty stream")
+            return
+        except Exception as e:
+            if not first:
+                # Already counted as a success at the first chunk; one call, one sample
+                raise
+            stats.record(failed=True)
+            logger.warning(f"{provider} failed for '{task}' stream: {e!r}")
+            errors.append(f"{provider}: {e!r}")
+
+    raise LLMUnavailableError(f"All providers failed for '{task}': {'; '.join(errors) or 'none configured'}")
+
+
+def router_metrics() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    return {
+        task: {provider: stats.to_dict() for provider, stats in providers.items()}
+        for task, providers in _stats.items()
+    }
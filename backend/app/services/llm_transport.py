@@ -0,0 +1,140 @@
+import asyncio
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ProviderLimiter:
+    """
+    Per-provider admission control: a concurrency cap plus a token bucket
+    (rate_per_sec, bursting up to max_concurrency). Callers wait here rather
+    than collecting 429s from the provider; the wait is recorded so queueing
+    shows up in metrics.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, rate_per_sec: float):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate = max(rate_per_sec, 0.01)
+        self.capacity = float(self.max_concurrency)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+        self.in_flight = 0
+        self.calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _reserve(self) -> float:
+        """Takes a token and returns how long to wait before it is valid."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def _admitted(self, waited: float):
+        self.calls += 1
+        self.in_flight += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited > 1:
+            logger.info(f"{self.name} call queued for {waited:.2f}s")
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one provider slot for the duration of an async call or stream."""
+        started = time.perf_counter()
+        async with self._slots:
+            delay = self._reserve()
+            if delay:
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    # Hand the reserved token back; the call never went out
+                    self._tokens += 1
+                    raise
+            self._admitted(time.perf_counter() - started)
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "avg_queue_wait_ms": round(1000 * self.total_wait / self.calls, 1) if self.calls else 0.0,
+            "max_queue_wait_ms": round(1000 * self.max_wait, 1),
+        }
+
+
+LIMITERS = {
+    "openrouter": ProviderLimiter("openrouter", settings.OPENROUTER_MAX_CONCURRENCY, settings.OPENROUTER_RATE_PER_SEC),
+    "groq": ProviderLimiter("groq", settings.GROQ_MAX_CONCURRENCY, settings.GROQ_RATE_PER_SEC),
+    "gemini": ProviderLimiter("gemini", settings.GEMINI_MAX_CONCURRENCY, settings.GEMINI_RATE_PER_SEC),
+}
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    return LIMITERS[provider]
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE,
+        keepalive_expiry=60,
+    )
+
+
+_async_client: Optional[httpx.AsyncClient] = None
+_prompt_usage: Dict[str, Dict[str, int]] = {}
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """One keep-alive connection pool shared by every async provider SDK."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(limits=_http_limits(), timeout=settings.LLM_TIMEOUT_SECONDS)
+    return _async_client
+
+
+async def close_http_clients():
+    if _async_client is not None:
+        await _async_client.aclose()
+
+
+def _field(obj: Any, name: str) -> Any:
+    # SDK usage objects are models, but unknown provider extras arrive as dicts
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def record_prompt_usage(provider: str, usage: Any):
+    """Logs and totals cached vs uncached prompt tokens from a response's usage block."""
+    if usage is None:
+        return
+    prompt_tokens = _field(usage, "prompt_tokens") or 0
+    details = _field(usage, "prompt_tokens_details")
+    cached_tokens = (_field(details, "cached_tokens") if details else 0) or 0
+
+    totals = _prompt_usage.setdefault(provider, {"prompt_tokens": 0, "cached_prompt_tokens": 0})
+    totals["prompt_tokens"] += prompt_tokens
+    totals["cached_prompt_tokens"] += cached_tokens
+    logger.info(f"{provider} prompt tokens: {prompt_tokens} ({cached_tokens} cached)")
+
+
+def transport_metrics() -> Dict[str, Dict[str, Any]]:
+    return {
+        name: {**limiter.metrics(), **_prompt_usage.get(name, {})}
+        for name, limiter in LIMITERS.items()
+    }
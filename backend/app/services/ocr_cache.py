@@ -0,0 +1,25 @@
+from typing import Any, Dict, Optional
+
+from app.core.config import get_settings
+from app.services.result_cache import SQLiteResultCache
+
+settings = get_settings()
+
+_cache = SQLiteResultCache(
+    settings.OCR_CACHE_PATH, "ocr_cache",
+    max_bytes=settings.OCR_CACHE_MAX_MB * 1024 * 1024
+)
+
+
+def get_cached_result(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Returns a stored OCR result and bumps its LRU timestamp, or None."""
+    if not settings.OCR_CACHE_ENABLED:
+        return None
+    return _cache.get(cache_key)
+
+
+def store_result(cache_key: str, result: Dict[str, Any]):
+    """Stores an OCR result, then evicts least recently used entries over budget."""
+    if not settings.OCR_CACHE_ENABLED:
+        return
+    _cache.put(cache_key, result)
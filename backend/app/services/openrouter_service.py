@@ -1,28 +1,62 @@
 import os
 import json
+import asyncio
+import hashlib
 import logging
+from typing import Awaitable
 from openai import AsyncOpenAI
 from app.core.config import get_settings
+from app.core.executors import run_blocking
+from app.core.singleflight import SingleFlight
+from app.services import groq_client, llm_router
+from app.services.llm_transport import get_async_http_client, get_limiter, record_prompt_usage
+from app.services.result_cache import SQLiteResultCache
+from app.services.text_processing import CHARS_PER_TOKEN, chunk_by_pages
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+try:
+    # google-genai is optional; without it Gemini just drops off the routes
+    from app.services import gemini_client
+except ImportError:
+    gemini_client = None
+
 client = AsyncOpenAI(
     base_url="https://openrouter.ai/api/v1",
     api_key=settings.OPENROUTER_API_KEY,
+    http_client=get_async_http_client(),
+)
+_limiter = get_limiter("openrouter")
+
+# Bump whenever the extraction prompt changes so cached answers are not reused
+EXTRACTION_PROMPT_VERSION = 1
+
+# Identical contracts uploaded at the same time share one model call
+_extraction_flights = SingleFlight("extraction")
+
+_extraction_cache = SQLiteResultCache(
+    settings.EXTRACTION_CACHE_PATH, "extraction_cache",
+    max_bytes=settings.EXTRACTION_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=settings.EXTRACTION_CACHE_TTL_HOURS * 3600
 )
 
-async def extract_contract_info(text_content: str):
-    """
-    Step 1: Universal Extraction Engine.
-    Kept at temperature 0 for strict accuracy during JSON extraction.
-    """
-    if not text_content:
-        raise ValueError("No text content provided.")
 
-    clean_text = " ".join(text_content.split())[:12000] 
+def _extraction_cache_key(clean_text: str, mode: str = "single") -> str:
+    raw = f"{settings.AI_MODEL}|v{EXTRACTION_PROMPT_VERSION}|{mode}|{clean_text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-    prompt = f"""
+
+def _build_extraction_prompt(clean_text: str, part: str = "") -> str:
+    # Chunked runs must not guess: absent fields have to stay empty so the
+    # merge can tell "not in this excerpt" from a real value.
+    part_rule = (
+        f"""
+    4. This is {part} of a longer contract. Use null for any field that is
+       not stated in THIS excerpt."""
+        if part else ""
+    )
+    return f"""
     You are a financial data extractor. Output ONLY raw JSON.
     RULES:
     1. Map 'Vehicle Price', 'Agreed Value', or 'Sale Price' to "purchasePrice".
@@ -31,7 +65,7 @@ async def extract_contract_info(text_content: str):
    - IMPORTANT: If the text appears to be broken characters, OCR noise, or scrambled 
      formatting (e.g., 'E,x,c,e,s,s' or 'k,i,l,o'), IGNORE it. 
    - DO NOT include standard lease terms like 'Excess Kilometer Charge' in this list 
-     unless they include an unusual hidden cost..
+     unless they include an unusual hidden cost..{part_rule}
     
     TEXT TO ANALYZE:
     {clean_text}
@@ -50,174 +84,364 @@ async def extract_contract_info(text_content: str):
     }}
     """
 
-    try:
+
+EXTRACTION_SYSTEM_PROMPT = "Specialized financial parser. Output ONLY JSON."
+
+
+async def _openrouter_json(system_prompt: str, prompt: str) -> str:
+    async with _limiter.slot():
         response = await client.chat.completions.create(
             model=settings.AI_MODEL,
             messages=[
-                {"role": "system", "content": "Specialized financial parser. Output ONLY JSON."},
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt}
             ],
             response_format={"type": "json_object"},
             temperature=0 
         )
-        data = json.loads(response.choices[0].message.content)
+    record_prompt_usage("openrouter", response.usage)
+    return response.choices[0].message.content
+
+
+async def _parsed(raw: Awaitable[str]) -> dict:
+    # Parsing inside the attempt lets the router fail over on malformed JSON
+    data = json.loads(await raw)
+
+    if isinstance(data, list):
+        data = data[0] if len(data) > 0 else {}
+    elif isinstance(data, dict) and "data" in data:
+        data = data["data"]
+    return data
+
+
+async def _run_extraction(prompt: str) -> dict:
+    attempts = {
+        "openrouter": lambda: _parsed(_openrouter_json(EXTRACTION_SYSTEM_PROMPT, prompt)),
+        "groq": lambda: _parsed(groq_client.complete_json(EXTRACTION_SYSTEM_PROMPT, prompt)),
+    }
+    if gemini_client:
+        attempts["gemini"] = lambda: _parsed(gemini_client.complete_json(EXTRACTION_SYSTEM_PROMPT, prompt))
+    return await llm_router.call("extraction", attempts, hedge=settings.LLM_HEDGE_EXTRACTION)
+
+
+# Merge preferences for categorical fields, strongest evidence first.
+# Risk levels keep the most severe finding; for the rest, the "default"
+# answer (what a model says when the excerpt is silent) ranks last.
+_ENUM_PREFERENCE = {
+    "earlyTerminationLevel": ["High", "Medium", "Low"],
+    "penaltyLevel": ["High", "Medium", "Low"],
+    "purchaseOptionStatus": ["Available", "Not Available"],
+    "maintenanceType": ["Dealer", "Shared", "Customer"],
+    "warrantyType": ["Included", "Partial", "Not Included"],
+}
+_PLACEHOLDERS = {"", "unknown", "n/a", "na", "none", "null", "string", "vehicle"}
+
+
+def _fee_list(value) -> list:
+    """One chunk's junk_fees as a list. Models sometimes answer "None" or "Doc fee, Admin fee" instead of a list."""
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, list):
+        return []
+    return [fee for fee in value if str(fee).strip().lower() not in _PLACEHOLDERS]
+
+
+def merge_extractions(parts: list) -> dict:
+    """
+    Field-level reduce over per-chunk results (in document order).
+    - numbers / strings: the most common real value wins; ties go to the
+      earliest chunk, where lease summaries usually sit.
+    - VIN: a 17-character value beats anything shorter.
+    - categorical fields: ranked by _ENUM_PREFERENCE.
+    - junk_fees: de-duplicated union in order of appearance.
+    """
+    merged: dict = {}
+    keys = []
+    for part in parts:
+        keys += [k for k in part if k not in keys]
+
+    for key in keys:
+        values = [p.get(key) for p in parts]
+        if key == "junk_fees":
+            seen, fees = set(), []
+            for value in values:
+                for fee in _fee_list(value):
+                    if str(fee).strip().lower() not in seen:
+                        seen.add(str(fee).strip().lower())
+                        fees.append(fee.strip() if isinstance(fee, str) else fee)
+            merged[key] = fees
+            continue
+
+        if key in _ENUM_PREFERENCE:
+            ranked = _ENUM_PREFERENCE[key]
+            found = [v for v in values if v in ranked]
+            merged[key] = min(found, key=ranked.index) if found else None
+            continue
+
+        real = [
+            v for v in values
+            if v not in (None, 0, 0.0) and str(v).strip().lower() not in _PLACEHOLDERS
+        ]
+        if key == "vin":
+            real = [v for v in real if len(str(v).strip()) == 17] or real
+        if not real:
+            merged[key] = next((v for v in values if v is not None), None)
+            continue
+        counts = {}
+        for v in real:
+            counts[str(v)] = counts.get(str(v), 0) + 1
+        merged[key] = max(real, key=lambda v: counts[str(v)])  # max keeps the first on ties
+    return merged
+
+
+async def _extract_chunked(chunks: list) -> dict:
+    """Map: one extraction per chunk, concurrently. Reduce: merge_extractions."""
+    total = len(chunks)
+    prompts = [
+        _build_extraction_prompt(" ".join(chunk.split()), part=f"excerpt {i + 1} of {total}")
+        for i, chunk in enumerate(chunks)
+    ]
+    results = await asyncio.gather(*(_run_extraction(p) for p in prompts), return_exceptions=True)
+
+    parts = [r for r in results if isinstance(r, dict)]
+    failures = [r for r in results if isinstance(r, Exception)]
+    if not parts:
+        raise failures[0]
+    if failures:
+        logger.warning(f"{len(failures)} of {total} extraction chunks failed: {failures[0]}")
+    return merge_extractions(parts)
+
+
+async def extract_contract_info(text_content: str, use_cache: bool = True):
+    """
+    Step 1: Universal Extraction Engine.
+    Kept at temperature 0 for strict accuracy during JSON extraction, which is
+    also what makes answers for identical text safe to reuse from the cache.
+    Pass use_cache=False to force a fresh model call.
+    In "chunked" EXTRACTION_MODE, contracts longer than one chunk are split on
+    page markers, extracted concurrently and merged field by field instead of
+    being cut off at 12000 characters.
+    """
+    if not text_content:
+        raise ValueError("No text content provided.")
 
-        if isinstance(data, list):
-            data = data[0] if len(data) > 0 else {}
-        elif isinstance(data, dict) and "data" in data:
-            data = data["data"]
-            
+    chunks = []
+    if settings.EXTRACTION_MODE == "chunked":
+        chunks = chunk_by_pages(text_content, settings.EXTRACTION_CHUNK_TOKENS * CHARS_PER_TOKEN)
+        if len(chunks) > settings.EXTRACTION_MAX_CHUNKS:
+            logger.warning(f"Contract has {len(chunks)} chunks; extracting the first {settings.EXTRACTION_MAX_CHUNKS}")
+            chunks = chunks[:settings.EXTRACTION_MAX_CHUNKS]
+
+    if len(chunks) > 1:
+        mode = f"chunked:{settings.EXTRACTION_CHUNK_TOKENS}:{settings.EXTRACTION_MAX_CHUNKS}"
+        clean_text = " ".join(" ".join(chunks).split())
+    else:
+        mode = "single"
+        clean_text = " ".join(text_content.split())[:12000] 
+
+    use_cache = use_cache and settings.EXTRACTION_CACHE_ENABLED
+    cache_key = _extraction_cache_key(clean_text, mode)
+    if use_cache:
+        cached = await run_blocking(_extraction_cache.get, cache_key)
+        if cached is not None:
+            logger.info("Extraction cache hit")
+            return cached
+
+    async def _extract():
+        if len(chunks) > 1:
+            logger.info(f"Chunked extraction over {len(chunks)} chunks")
+            data = await _extract_chunked(chunks)
+        else:
+            data = await _run_extraction(_build_extraction_prompt(clean_text))
+
+        if use_cache and data:
+            await run_blocking(_extraction_cache.put, cache_key, data)
         return data
+
+    try:
+        # Callers update the dict in place, so coalesced callers get their own copy
+        return dict(await _extraction_flights.do(cache_key, _extract))
     except Exception as e:
         logger.error(f"Extraction failed: {e}")
         raise e
 
-async def get_chat_response_stream(query: str, context: str = "", system_prompt: str = ""):
-    """
-    Step 2: Context-Locked Streamer.
-    UPDATED: Advanced persona for detailed, ChatGPT-style conversational analysis.
-    """
-    base_instruction = (
-        "You are **LeaseIQ**, a world-class automotive financial intelligence assistant and "
-        "consumer-protection expert. Your role is to help users understand, evaluate, and "
-        "negotiate vehicle lease agreements with clarity, accuracy, and confidence.\n\n"
-
-        "CORE IDENTITY:\n"
-        "- Act like a premium financial consultant, not a chatbot.\n"
-        "- Prioritize the user's financial interest at all times.\n"
-        "- Be transparent, practical, and authoritative.\n\n"
-
-        "GREETING & ACTIVATION RULE:\n"
-        "- If the user says 'hello', 'hi', or sends a casual greeting, respond with a short, "
-        "friendly, professional greeting ONLY.\n"
-        "- Do NOT perform any analysis unless:\n"
-        "  a) A specific question is asked, OR\n"
-        "  b) Lease / contract context is provided.\n\n"
-        "ACKNOWLEDGMENT RULE (CRITICAL UX RULE):\n"
-        "- If the user says 'thank you', 'thanks', 'ok', 'okay', 'got it', or similar acknowledgments:\n"
-        "  • Respond briefly and politely.\n"
-        "  • Do NOT reintroduce yourself.\n"
-        "  • Do NOT trigger analysis.\n"
-        "  • Do NOT ask follow-up questions unless the user asks for more help.\n"
-        "  • Example responses:\n"
-        "    - 'You're welcome! Glad I could help.'\n"
-        "    - 'Happy to help anytime.'\n"
-        "    - 'Anytime!'\n\n"
-
-        "INTENT-FIRST RULE (CRITICAL):\n"
-        "- Always identify the user's PRIMARY intent before responding.\n"
-        "- If the user asks about a specific topic (e.g., junk fees, APR, mileage, buyout, "
-        "end-of-lease, down payment), focus the response mainly on THAT topic.\n"
-        "- Do NOT provide a full lease review unless the user explicitly asks for it.\n\n"
-
-        "SIMPLE QUESTION / DIRECT ANSWER RULE (CRITICAL PERFORMANCE RULE):\n"
-        "- If the user's question is short, factual, or numeric (e.g., 'purchase cost', "
-        "'vehicle price', 'monthly payment', 'APR', 'balloon payment'):\n"
-        "  • Provide a DIRECT answer in the first 1–2 lines.\n"
-        "  • Do NOT perform full analysis unless the user explicitly asks for explanation.\n"
-        "  • Optional: Add a brief clarification section if helpful.\n\n"
-
-        "ANSWER-FIRST RULE:\n"
-        "- Always place the direct answer at the very top of the response.\n"
-        "- Explanations, breakdowns, or guidance must come AFTER the answer.\n\n"
-
-        "TOPIC-SPECIFIC RESPONSE FRAMEWORK (MANDATORY):\n"
-        "When responding to any specific leasing topic:\n"
-        "1. Explain the concept clearly in general terms.\n"
-        "2. Apply the concept strictly to the provided lease context.\n"
-        "3. Identify:\n"
-        "   - Standard / legitimate terms\n"
-        "   - High-risk, costly, or negotiable terms\n"
-        "4. Explain real-world financial impact (who pays, when, and how much it could cost).\n"
-        "5. End with practical negotiation or decision-making guidance.\n\n"
-
-        "FULL LEASE ANALYSIS RULE (ONLY WHEN REQUESTED):\n"
-        "If the user asks for a full review, structure the response as:\n"
-        "- Professional greeting\n"
-        "- Lease Summary (key numbers only)\n"
-        "- Cost & Risk Analysis (APR, payments, mileage, down payment, residual value)\n"
-        "- Hidden / Junk Fee Review\n"
-        "- End-of-Lease Risks\n"
-        "- Negotiation Tips\n"
-        "- LeaseIQ Verdict (Short, clear recommendation)\n\n"
-
-        "DEPTH & QUALITY RULES:\n"
-        "- Avoid shallow answers EXCEPT when the user asks a direct factual question.\n"
-        "- Explain whether each term is good or bad and WHY.\n"
-        "- Quantify impact whenever possible (cost over time, penalties, exposure).\n\n"
-
-        "CONTEXT SAFETY RULE:\n"
-        "- Use ONLY the provided 'EXTRACTED CONTEXT' for vehicle-specific numbers, fees, "
-        "rates, and terms.\n"
-        "- Do NOT invent fees, prices, or clauses.\n"
-        "- If information is missing or unclear, explicitly state assumptions or limitations.\n\n"
-
-        "TERM INTERPRETATION RULE:\n"
-        "- Interpret common user phrases intelligently:\n"
-        "  • 'purchase cost' → total amount paid to own the vehicle\n"
-        "  • 'buyout price' → balloon payment / GFV\n"
-        "  • 'car price' → agreed vehicle price before interest\n"
-        "  • 'total cost' → all payments + down payment + buyout\n\n"
-        
-        "FORMATTING & READABILITY:\n"
-        "- Use Markdown extensively.\n"
-        "- Use ## headers, **bold emphasis**, bullet points, and spacing for clarity.\n"
-        "- Responses should feel scannable, premium, and user-friendly.\n\n"
-
-        "TONE & TRUST:\n"
-        "- Be calm, confident, and consumer-protective.\n"
-        "- Never shame the user for bad deals.\n"
-        "- Avoid legal disclaimers unless absolutely necessary.\n\n"
-
-        "GOAL:\n"
-        "Help the user avoid costly mistakes, negotiate better terms, and make informed "
-        "leasing decisions with confidence."
-
+# Models that only cache prompts at explicit cache_control breakpoints;
+# the rest (OpenAI, Gemini, DeepSeek, ...) cache matching prefixes implicitly
+_EXPLICIT_CACHE_PREFIXES = ("anthropic/",)
+
+
+def _with_cache_breakpoints(messages: list) -> list:
+    """Marks the leading system messages (persona, contract context) as cacheable."""
+    if not settings.AI_MODEL.startswith(_EXPLICIT_CACHE_PREFIXES):
+        return messages
+    marked = []
+    for i, message in enumerate(messages):
+        if message["role"] == "system" and i < 2:
+            message = {
+                "role": "system",
+                "content": [{"type": "text", "text": message["content"], "cache_control": {"type": "ephemeral"}}]
+            }
+        marked.append(message)
+    return marked
+
+
+async def _openrouter_stream(messages: list, temperature: float, max_tokens: int):
+    # The slot is held for the whole stream so open streams count against
+    # the provider's concurrency cap
+    async with _limiter.slot():
+        stream = await client.chat.completions.create(
+            model=settings.AI_MODEL,
+            messages=_with_cache_breakpoints(messages),
+            stream=True,
+            stream_options={"include_usage": True},
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if chunk.usage:
+                record_prompt_usage("openrouter", chunk.usage)
+
+
+def _chat_attempts(messages: list, temperature: float, max_tokens: int) -> dict:
+    return {
+        "openrouter": lambda: _openrouter_stream(messages, temperature, max_tokens),
+        "groq": lambda: groq_client.stream_chat(messages, temperature, max_tokens),
+    }
+
+
+# Static persona for /chat. Built once and always sent as the first message,
+# so providers that cache prompt prefixes can reuse it across requests.
+CHAT_BASE_INSTRUCTION = (
+    "You are **LeaseIQ**, a world-class automotive financial intelligence assistant and "
+    "consumer-protection expert. Your role is to help users understand, evaluate, and "
+    "negotiate vehicle lease agreements with clarity, accuracy, and confidence.\n\n"
+
+    "CORE IDENTITY:\n"
+    "- Act like a premium financial consultant, not a chatbot.\n"
+    "- Prioritize the user's financial interest at all times.\n"
+    "- Be transparent, practical, and authoritative.\n\n"
+
+    "GREETING & ACTIVATION RULE:\n"
+    "- If the user says 'hello', 'hi', or sends a casual greeting, respond with a short, "
+    "friendly, professional greeting ONLY.\n"
+    "- Do NOT perform any analysis unless:\n"
+    "  a) A specific question is asked, OR\n"
+    "  b) Lease / contract context is provided.\n\n"
+    "ACKNOWLEDGMENT RULE (CRITICAL UX RULE):\n"
+    "- If the user says 'thank you', 'thanks', 'ok', 'okay', 'got it', or similar acknowledgments:\n"
+    "  • Respond briefly and politely.\n"
+    "  • Do NOT reintroduce yourself.\n"
+    "  • Do NOT trigger analysis.\n"
+    "  • Do NOT ask follow-up questions unless the user asks for more help.\n"
+    "  • Example responses:\n"
+    "    - 'You're welcome! Glad I could help.'\n"
+    "    - 'Happy to help anytime.'\n"
+    "    - 'Anytime!'\n\n"
+
+    "INTENT-FIRST RULE (CRITICAL):\n"
+    "- Always identify the user's PRIMARY intent before responding.\n"
+    "- If the user asks about a specific topic (e.g., junk fees, APR, mileage, buyout, "
+    "end-of-lease, down payment), focus the response mainly on THAT topic.\n"
+    "- Do NOT provide a full lease review unless the user explicitly asks for it.\n\n"
+
+    "SIMPLE QUESTION / DIRECT ANSWER RULE (CRITICAL PERFORMANCE RULE):\n"
+    "- If the user's question is short, factual, or numeric (e.g., 'purchase cost', "
+    "'vehicle price', 'monthly payment', 'APR', 'balloon payment'):\n"
+    "  • Provide a DIRECT answer in the first 1–2 lines.\n"
+    "  • Do NOT perform full analysis unless the user explicitly asks for explanation.\n"
+    "  • Optional: Add a brief clarification section if helpful.\n\n"
+
+    "ANSWER-FIRST RULE:\n"
+    "- Always place the direct answer at the very top of the response.\n"
+    "- Explanations, breakdowns, or guidance must come AFTER the answer.\n\n"
+
+    "TOPIC-SPECIFIC RESPONSE FRAMEWORK (MANDATORY):\n"
+    "When responding to any specific leasing topic:\n"
+    "1. Explain the concept clearly in general terms.\n"
+    "2. Apply the concept strictly to the provided lease context.\n"
+    "3. Identify:\n"
+    "   - Standard / legitimate terms\n"
+    "   - High-risk, costly, or negotiable terms\n"
+    "4. Explain real-world financial impact (who pays, when, and how much it could cost).\n"
+    "5. End with practical negotiation or decision-making guidance.\n\n"
+
+    "FULL LEASE ANALYSIS RULE (ONLY WHEN REQUESTED):\n"
+    "If the user asks for a full review, structure the response as:\n"
+    "- Professional greeting\n"
+    "- Lease Summary (key numbers only)\n"
+    "- Cost & Risk Analysis (APR, payments, mileage, down payment, residual value)\n"
+    "- Hidden / Junk Fee Review\n"
+    "- End-of-Lease Risks\n"
+    "- Negotiation Tips\n"
+    "- LeaseIQ Verdict (Short, clear recommendation)\n\n"
+
+    "DEPTH & QUALITY RULES:\n"
+    "- Avoid shallow answers EXCEPT when the user asks a direct factual question.\n"
+    "- Explain whether each term is good or bad and WHY.\n"
+    "- Quantify impact whenever possible (cost over time, penalties, exposure).\n\n"
+
+    "CONTEXT SAFETY RULE:\n"
+    "- Use ONLY the provided 'EXTRACTED CONTEXT' for vehicle-specific numbers, fees, "
+    "rates, and terms.\n"
+    "- Do NOT invent fees, prices, or clauses.\n"
+    "- If information is missing or unclear, explicitly state assumptions or limitations.\n\n"
+
+    "TERM INTERPRETATION RULE:\n"
+    "- Interpret common user phrases intelligently:\n"
+    "  • 'purchase cost' → total amount paid to own the vehicle\n"
+    "  • 'buyout price' → balloon payment / GFV\n"
+    "  • 'car price' → agreed vehicle price before interest\n"
+    "  • 'total cost' → all payments + down payment + buyout\n\n"
+    
+    "FORMATTING & READABILITY:\n"
+    "- Use Markdown extensively.\n"
+    "- Use ## headers, **bold emphasis**, bullet points, and spacing for clarity.\n"
+    "- Responses should feel scannable, premium, and user-friendly.\n\n"
+
+    "TONE & TRUST:\n"
+    "- Be calm, confident, and consumer-protective.\n"
+    "- Never shame the user for bad deals.\n"
+    "- Avoid legal disclaimers unless absolutely necessary.\n\n"
+
+    "GOAL:\n"
+    "Help the user avoid costly mistakes, negotiate better terms, and make informed "
+    "leasing decisions with confidence."
+)
 
-    )
 
-    
-    combined_system = f"{base_instruction}\n\n{system_prompt}" if system_prompt else base_instruction
-    
-    messages = [{"role": "system", "content": combined_system}]
-    
+def _chat_messages(query: str, context: str = "", system_prompt: str = "") -> list:
+    """
+    Orders messages from most to least stable: the static persona, then the
+    contract context (fixed for a whole conversation), then the per-request
+    instruction and the user turn. Keeping the variable parts last is what
+    lets provider-side prompt caching hit on the shared prefix.
+    """
+    messages = [{"role": "system", "content": CHAT_BASE_INSTRUCTION}]
     if context:
         messages.append({
             "role": "system", 
             "content": f"### EXTRACTED CONTEXT (MANDATORY DATA) ###\n{context}\n\nTask: Provide a thorough breakdown of this specific document."
         })
-    
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
     messages.append({"role": "user", "content": query})
+    return messages
 
-    try:
-        stream = await client.chat.completions.create(
-            model=settings.AI_MODEL,
-            messages=messages,
-            stream=True,
-            temperature=0.7, # Increased for more natural, detailed flow
-            max_tokens=1500  # Ensures the response isn't cut short
-        )
-        
-        yield '{"assistant_message": "'
-        
-        async for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                # Escape characters to maintain valid JSON streaming for ChatWindow.jsx
-                clean_chunk = (
-                    chunk.choices[0].delta.content
-                    .replace('\\', '\\\\')
-                    .replace('"', '\\"')
-                    .replace('\n', '\\n')
-                    .replace('\r', '\\r')
-                    .replace('\t', '\\t')
-                )
-                yield clean_chunk
-        
-        yield '"}'
-        
-    except Exception as e:
-        logger.error(f"Streaming failed: {e}")
-        yield '{"assistant_message": "Analysis service error. Please try again."}'
+
+async def get_chat_response_stream(query: str, context: str = "", system_prompt: str = ""):
+    """
+    Step 2: Context-Locked Streamer.
+    UPDATED: Advanced persona for detailed, ChatGPT-style conversational analysis.
+    """
+    messages = _chat_messages(query, context, system_prompt)
+
+    # Increased temperature for more natural, detailed flow; max_tokens
+    # ensures the response isn't cut short. Raw deltas are yielded; SSE
+    # framing and error events are the caller's job (see app.core.sse).
+    async for delta in llm_router.stream("chat", _chat_attempts(messages, temperature=0.7, max_tokens=1500)):
+        yield delta
 
 async def get_simulator_response(query: str, contract_data: dict, persona: str = "aggressive"):
     """Step 3: The Dealer Simulator (Improved for better dialogue)."""
@@ -231,28 +455,8 @@ async def get_simulator_response(query: str, contract_data: dict, persona: str =
     
     messages = [{"role": "system", "content": system_instruction}, {"role": "user", "content": query}]
 
-    try:
-        stream = await client.chat.completions.create(
-            model=settings.AI_MODEL,
-            messages=messages,
-            stream=True,
-            temperature=0.8,
-            max_tokens=1000
-        )
-        yield '{"assistant_message": "'
-        async for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                clean_chunk = (
-                    chunk.choices[0].delta.content
-                    .replace('\\', '\\\\')
-                    .replace('"', '\\"')
-                    .replace('\n', '\\n')
-                    .replace('\r', '\\r')
-                )
-                yield clean_chunk
-        yield '"}'
-    except Exception as e:
-        yield '{"assistant_message": "The dealer is currently on another call."}'
+    async for delta in llm_router.stream("chat", _chat_attempts(messages, temperature=0.8, max_tokens=1000)):
+        yield delta
 
 
 # import os
@@ -0,0 +1,105 @@
+import json
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import closing, contextmanager
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteResultCache:
+    """
+    Small persistent key -> JSON cache on a local SQLite file.
+    Entries older than ttl_seconds are treated as misses, and writes evict
+    least recently used entries once the table grows past max_bytes.
+    Each thread keeps one connection to the file, as db_helper does.
+    """
+
+    def __init__(self, path: str, table: str, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        try:
+            with closing(sqlite3.connect(self.path, timeout=10)) as conn, conn:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.table} (
+                        cache_key TEXT PRIMARY KEY,
+                        result TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_last_access ON {self.table}(last_access)")
+        except sqlite3.Error as e:
+            # The cache is an optimization; get/put will keep missing and log why
+            logger.warning(f"{self.table} setup failed: {e}")
+
+    @contextmanager
+    def _connection(self):
+        """This thread's connection; commits on a clean exit and rolls back on error."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def get(self, cache_key: str) -> Optional[Any]:
+        """Returns a stored result and bumps its LRU timestamp, or None."""
+        try:
+            with self._connection() as conn:
+                row = conn.execute(
+                    f"SELECT result, created_at FROM {self.table} WHERE cache_key = ?", (cache_key,)
+                ).fetchone()
+                if row and self.ttl_seconds and time.time() - row[1] > self.ttl_seconds:
+                    conn.execute(f"DELETE FROM {self.table} WHERE cache_key = ?", (cache_key,))
+                    row = None
+                elif row:
+                    conn.execute(
+                        f"UPDATE {self.table} SET last_access = ? WHERE cache_key = ?",
+                        (time.time(), cache_key)
+                    )
+            return json.loads(row[0]) if row else None
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"{self.table} read failed: {e}")
+            return None
+
+    def put(self, cache_key: str, result: Any):
+        """Stores a result, then evicts expired and least recently used entries over budget."""
+        try:
+            payload = json.dumps(result)
+            now = time.time()
+            with self._connection() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (cache_key, result, size, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (cache_key, payload, len(payload), now, now)
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"{self.table} write failed: {e}")
+
+    def _evict(self, conn):
+        if self.ttl_seconds:
+            conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for cache_key, size in conn.execute(f"SELECT cache_key, size FROM {self.table} ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            stale.append((cache_key,))
+            total -= size
+        conn.executemany(f"DELETE FROM {self.table} WHERE cache_key = ?", stale)
+        logger.info(f"{self.table} evicted {len(stale)} entries")
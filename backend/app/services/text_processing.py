@@ -29,5 +29,120 @@ def handle_layout(text: str) -> str:
     return "\n".join(formatted)
 
 
+# Rough size of one LLM token in English/OCR text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+PAGE_MARKER = re.compile(r'^\s*--- PAGE \d+ ---\s*$', re.M)
+
+
+def split_pages(text: str) -> list:
+    """Splits OCR output on its '--- PAGE N ---' markers, keeping each marker with its page."""
+    starts = [m.start() for m in PAGE_MARKER.finditer(text)]
+    if not starts:
+        return [text] if text.strip() else []
+    if starts[0] > 0 and text[:starts[0]].strip():
+        starts.insert(0, 0)
+    bounds = starts + [len(text)]
+    return [text[a:b].strip() for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+
+def _cut_line(line: str, room: int) -> tuple:
+    """Cuts at most room characters off line, at the last space that fits or mid-word if there is none."""
+    cut = line.rfind(" ", 0, room + 1)
+    if cut <= 0:
+        cut = room
+    return line[:cut], line[cut:].lstrip(" ")
+
+
+def chunk_by_pages(text: str, max_chars: int) -> list:
+    """
+    Packs whole pages into chunks of at most max_chars. A single page larger
+    than the budget is split on line boundaries instead of mid-sentence, and
+    a single line larger than the budget (common in PDF text layers) at the
+    last word boundary that fits.
+    """
+    chunks, current = [], ""
+    for page in split_pages(text):
+        pieces = [page]
+        if len(page) > max_chars:
+            pieces, piece = [], ""
+            for line in page.splitlines(keepends=True):
+                while len(piece) + len(line) > max_chars:
+                    if piece and len(line) <= max_chars:
+                        pieces.append(piece)
+                        piece = ""
+                        continue
+                    head, line = _cut_line(line, max_chars - len(piece))
+                    pieces.append(piece + head)
+                    piece = ""
+                piece += line
+            pieces.append(piece)
+
+        for piece in pieces:
+            if current and len(current) + len(piece) + 2 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 def validate_text(text: str) -> bool:
     return bool(text.strip()) and len(text.strip()) > 100
+
+
+# Key financial terms the extractor needs; once all appear, later pages
+# rarely change the core numbers.
+KEY_FINANCIAL_TERMS = {
+    "price": re.compile(r'(vehicle|sale|agreed|purchase|ex-showroom)\s+(price|value)', re.I),
+    "apr": re.compile(r'\b(apr|interest\s+rate|rate\s+of\s+interest)\b', re.I),
+    "monthly": re.compile(r'(monthly\s+(payment|instal?ment|rental)|\bemi\b)', re.I),
+    "term": re.compile(r'\b(\d{2,3})\s*(months|mos)\b|\b(lease\s+term|tenure)\b', re.I),
+}
+
+
+def has_key_financial_terms(text: str) -> bool:
+    return all(pattern.search(text) for pattern in KEY_FINANCIAL_TERMS.values())
+
+
+# Money amounts and percentages, e.g. "Rs. 12,50,000", "$ 450.00", "9.5 %"
+MONEY_PATTERN = re.compile(r'(rs\.?|inr|\$)\s*[\d,]+(\.\d+)?|\b\d{1,3}(,\d{2,3})+(\.\d+)?\b|\b\d+(\.\d+)?\s*%', re.I)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def financial_density(text: str) -> float:
+    """Key-term and money/percentage hits per 1,000 characters."""
+    hits = sum(len(p.findall(text)) for p in KEY_FINANCIAL_TERMS.values())
+    hits += len(MONEY_PATTERN.findall(text))
+    return hits * 1000 / max(len(text), 1)
+
+
+def select_financial_pages(text: str, max_chars: int) -> str:
+    """
+    Fits text into max_chars by keeping whole pages, richest in financial
+    content first, then restoring document order. The first page (parties,
+    vehicle) is always preferred. Pages larger than half the budget are
+    split (on lines, or words for very long lines) so one long page cannot
+    crowd out the rest.
+    """
+    if len(text) <= max_chars:
+        return text
+
+    units = []
+    for page in split_pages(text):
+        units.extend(chunk_by_pages(page, max_chars // 2) if len(page) > max_chars // 2 else [page])
+
+    ranked = sorted(range(len(units)), key=lambda i: (i != 0, -financial_density(units[i])))
+    keep, used = [], 0
+    for i in ranked:
+        cost = len(units[i]) + 2
+        if used + cost <= max_chars:
+            keep.append(i)
+            used += cost
+    if not keep:
+        return text[:max_chars]
+    return "\n\n".join(units[i] for i in sorted(keep))
@@ -0,0 +1,143 @@
+import asyncio
+import time
+import uuid
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.services.contract_pipeline import process_contract
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Terminal states; a job never leaves one of these
+FINISHED = ("done", "failed")
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at UPLOAD_QUEUE_DEPTH."""
+
+
+class UploadJob:
+    def __init__(
+        self, file_path: str, filename: str,
+        content_hash: Optional[str] = None, refresh: bool = False
+    ):
+        self.job_id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.filename = filename
+        self.content_hash = content_hash
+        self.refresh = refresh
+        self.status = "queued"
+        self.stage = "saved"
+        self.progress: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self._changed = asyncio.Event()
+
+    def publish(self, stage: str, **info: Any):
+        """Records a stage transition and wakes every SSE subscriber."""
+        self.stage = stage
+        self.progress = info
+        self.events.append({"stage": stage, **info})
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+_jobs: Dict[str, UploadJob] = {}
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+
+
+def _ensure_workers():
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=max(1, settings.UPLOAD_QUEUE_DEPTH))
+    if not _workers:
+        for i in range(max(1, settings.UPLOAD_JOB_WORKERS)):
+            _workers.append(asyncio.create_task(_worker(i)))
+
+
+async def _worker(worker_id: int):
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await _queue.get()
+        job.status = "running"
+
+        # OCR progress arrives on pool threads; hop back onto the loop
+        def report(stage: str, **info: Any):
+            loop.call_soon_threadsafe(lambda: job.publish(stage, **info))
+
+        try:
+            job.result = await process_contract(
+                job.file_path, job.filename, content_hash=job.content_hash,
+                report=report, refresh=job.refresh
+            )
+            job.status = "done"
+        except Exception as e:
+            logger.error(f"Upload job {job.job_id} failed: {e}", exc_info=True)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            # Let queued progress callbacks land before the final event
+            await asyncio.sleep(0)
+            if job.status == "failed":
+                # Same message the status endpoint reports
+                job.publish(job.status, error=job.error)
+            else:
+                job.publish(job.status)
+            _queue.task_done()
+
+
+def _purge_expired():
+    cutoff = time.time() - settings.UPLOAD_JOB_TTL_SECONDS
+    for job_id in [j.job_id for j in _jobs.values() if j.finished_at and j.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def submit_job(
+    file_path: str, filename: str,
+    content_hash: Optional[str] = None, refresh: bool = False
+) -> UploadJob:
+    """
+    Queues an already-saved PDF for background processing.
+    Raises QueueFullError instead of blocking so callers can shed load.
+    """
+    _ensure_workers()
+    _purge_expired()
+
+    job = UploadJob(file_path, filename, content_hash, refresh)
+    try:
+        _queue.put_nowait(job)
+    except asyncio.QueueFull:
+        raise QueueFullError("Upload queue is full. Please retry shortly.")
+
+    _jobs[job.job_id] = job
+    job.publish("saved")
+    return job
+
+
+def get_job(job_id: str) -> Optional[UploadJob]:
+    return _jobs.get(job_id)
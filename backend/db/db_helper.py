@@ -1,6 +1,10 @@
 import sqlite3
+import json
 import logging
 import os
+import threading
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
@@ -12,19 +16,151 @@ logger = logging.getLogger(__name__)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "ocr.db")
 
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  
+# Applied to every pooled connection. WAL lets readers run alongside the
+# single writer; synchronous=NORMAL is durable across app crashes in WAL mode
+# and skips an fsync per commit.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",  # 16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA temp_store=MEMORY",
+)
+
+# One connection per thread: sqlite3 connections are not shareable across
+# threads, and the blocking executor reuses a fixed set of them
+_local = threading.local()
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=5)
+    conn.row_factory = sqlite3.Row
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
+@contextmanager
+def db_connection():
+    """
+    Yields this thread's pooled connection to the SQLite database.
+    Commits when the block exits cleanly and rolls back on error; the
+    connection itself stays open for the next caller on the thread.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _connect()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+# Secondary indexes for the hot lookup paths. (file_name, id) serves
+# "latest contract with this filename" straight from the index: a seek on
+# file_name, then the last entry's id, with no sort.
+REQUIRED_INDEXES = {
+    "idx_contracts_file_name_id": "contracts(file_name, id)",
+}
+
+# Structured columns for the Negotiation Page and Finance logic. The OCR
+# text is not among them: it lives compressed in contract_texts and is only
+# read when a caller asks for it.
+CONTRACT_FIELDS = {
+    "make": "TEXT",
+    "model": "TEXT",
+    "year": "INTEGER",
+    "vin": "TEXT",
+    "aprPercent": "REAL",
+    "leaseTermMonths": "INTEGER",
+    "monthlyPaymentINR": "REAL",
+    "downPaymentINR": "REAL",
+    "residualValueINR": "REAL",
+    "annualMileageKm": "INTEGER",
+    "earlyTerminationLevel": "TEXT",
+    "purchaseOptionStatus": "TEXT",
+    "maintenanceType": "TEXT",
+    "warrantyType": "TEXT",
+    "penaltyLevel": "TEXT",
+    "junk_fees": "TEXT" # Added to store identifying fees as a JSON string
+}
+_CONTRACT_COLUMNS = ", ".join(["id", "file_name", "score", "created_at", *CONTRACT_FIELDS])
+
+# Lookups that must not fall back to a table scan, checked at startup
+_CONTRACT_BY_ID = f"SELECT {_CONTRACT_COLUMNS} FROM contracts WHERE id = ?"
+_CONTRACT_BY_FILE_NAME = f"SELECT {_CONTRACT_COLUMNS} FROM contracts WHERE file_name = ? ORDER BY id DESC LIMIT 1"
+
+TEXT_CODEC = "zlib"
+
 def init_db():
     """
     Initializes the database and automatically adds missing columns.
     This ensures Harshitha's Math Logic and the Chat Context always have data.
     """
     logger.info(f"Checking database at: {DB_PATH}")
-    conn = get_db_connection()
+    with db_connection() as conn:
+        _migrate(conn)
+        moved = _move_contract_texts(conn)
+        _ensure_indexes(conn)
+    if moved:
+        # Give the pages freed by the moved text back to the filesystem
+        with db_connection() as conn:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    logger.info("✅ Database schema is up to date.")
+
+def _move_contract_texts(conn, batch_size: int = 500) -> int:
+    """
+    Moves OCR text still stored inline in contracts.contract_text into
+    contract_texts and clears the inline copy. Returns how many rows moved.
+    """
+    moved = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, contract_text FROM contracts WHERE contract_text IS NOT NULL LIMIT ?", (batch_size,)
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            "INSERT OR REPLACE INTO contract_texts (contract_id, codec, body) VALUES (?, ?, ?)",
+            [(row["id"], TEXT_CODEC, pack_text(row["contract_text"])) for row in rows]
+        )
+        conn.executemany("UPDATE contracts SET contract_text = NULL WHERE id = ?", [(row["id"],) for row in rows])
+        moved += len(rows)
+    if moved:
+        logger.info(f"MIGRATION: Moved OCR text for {moved} contracts into contract_texts")
+    return moved
+
+def pack_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+def unpack_text(codec: str, body: bytes) -> str:
+    if codec != TEXT_CODEC:
+        raise ValueError(f"Unknown contract text codec: {codec}")
+    return zlib.decompress(body).decode("utf-8")
+
+def _ensure_indexes(conn):
+    """Creates any missing REQUIRED_INDEXES and warns if a lookup still plans a full scan."""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    created = False
+    for name, target in REQUIRED_INDEXES.items():
+        if name not in existing:
+            logger.info(f"MIGRATION: Creating index '{name}'")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+            created = True
+    if created:
+        # Full scan, so only when a new index needs statistics
+        conn.execute("ANALYZE contracts")
+    else:
+        # Cheap: only re-analyzes tables whose statistics have gone stale
+        conn.execute("PRAGMA optimize")
+
+    for query in (_CONTRACT_BY_ID, _CONTRACT_BY_FILE_NAME):
+        plan = " | ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", ("",)))
+        if "SCAN" in plan or "TEMP B-TREE" in plan:
+            logger.warning(f"Contract lookup is not indexed: {query} -> {plan}")
+
+def _migrate(conn):
     cursor = conn.cursor()
     
     # 1. Create tables if they don't exist
@@ -32,37 +168,38 @@ def init_db():
         CREATE TABLE IF NOT EXISTS contracts (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             file_name TEXT,
-            contract_text TEXT,
+            contract_text TEXT,  -- legacy inline OCR text; moved to contract_texts
             score INTEGER, 
             created_at TEXT
         )
     """)
+
+    # Deep analysis (Groq) results, one row per contract. analysis_version
+    # records the prompt/model that produced it so stale rows are recomputed.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS contract_analysis (
+            contract_id INTEGER PRIMARY KEY REFERENCES contracts(id),
+            analysis_version TEXT NOT NULL,
+            analysis_json TEXT NOT NULL,
+            created_at TEXT
+        )
+    """)
     
-    # 2. Define the REQUIRED columns for the Negotiation Page and Finance logic
-    required_columns = {
-        "make": "TEXT",
-        "model": "TEXT",
-        "year": "INTEGER",
-        "vin": "TEXT",
-        "aprPercent": "REAL",
-        "leaseTermMonths": "INTEGER",
-        "monthlyPaymentINR": "REAL",
-        "downPaymentINR": "REAL",
-        "residualValueINR": "REAL",
-        "annualMileageKm": "INTEGER",
-        "earlyTerminationLevel": "TEXT",
-        "purchaseOptionStatus": "TEXT",
-        "maintenanceType": "TEXT",
-        "warrantyType": "TEXT",
-        "penaltyLevel": "TEXT",
-        "junk_fees": "TEXT" # Added to store identifying fees as a JSON string
-    }
+    # Raw OCR text, compressed, one row per contract. Kept out of the
+    # contracts row so structured lookups don't page through it.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS contract_texts (
+            contract_id INTEGER PRIMARY KEY REFERENCES contracts(id),
+            codec TEXT NOT NULL,
+            body BLOB NOT NULL
+        )
+    """)
     
-    # 3. Migration: Add missing columns one by one
+    # 2. Migration: Add missing CONTRACT_FIELDS columns one by one
     cursor.execute("PRAGMA table_info(contracts)")
     existing_columns = [row[1] for row in cursor.fetchall()]
     
-    for col_name, col_type in required_columns.items():
+    for col_name, col_type in CONTRACT_FIELDS.items():
         if col_name not in existing_columns:
             logger.info(f"MIGRATION: Adding missing column '{col_name}'")
             try:
@@ -70,84 +207,171 @@ def init_db():
             except sqlite3.OperationalError as e:
                 logger.error(f"Migration failed for {col_name}: {e}")
 
-    conn.commit()
-    conn.close()
-    logger.info("✅ Database schema is up to date.")
+def junk_fees_text(junk_fees) -> str:
+    """Stored form of junk_fees: comma-separated. Accepts a list or an already joined string."""
+    if isinstance(junk_fees, str):
+        return junk_fees
+    return ", ".join(junk_fees or [])
 
 def save_contract_to_db(file_name: str, contract_text: str, extraction_data: dict, score: int = 0):
     """Saves detailed contract data and returns the new row ID string."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
         # We convert junk_fees list to a string for SQLite storage
-        junk_fees_str = ", ".join(extraction_data.get('junk_fees', []))
-
-        cursor.execute("""
-            INSERT INTO contracts (
-                file_name, contract_text, make, model, year, vin, 
-                aprPercent, leaseTermMonths, monthlyPaymentINR, 
-                downPaymentINR, residualValueINR, annualMileageKm,
-                earlyTerminationLevel, purchaseOptionStatus, 
-                maintenanceType, warrantyType, penaltyLevel, junk_fees,
-                score, created_at
+        junk_fees_str = junk_fees_text(extraction_data.get('junk_fees'))
+
+        with db_connection() as conn:
+            cursor = conn.execute("""
+                INSERT INTO contracts (
+                    file_name, make, model, year, vin, 
+                    aprPercent, leaseTermMonths, monthlyPaymentINR, 
+                    downPaymentINR, residualValueINR, annualMileageKm,
+                    earlyTerminationLevel, purchaseOptionStatus, 
+                    maintenanceType, warrantyType, penaltyLevel, junk_fees,
+                    score, created_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                file_name, 
+                extraction_data.get('make'),
+                extraction_data.get('model'),
+                extraction_data.get('year'),
+                extraction_data.get('vin'),
+                extraction_data.get('aprPercent'),
+                extraction_data.get('leaseTermMonths'),
+                extraction_data.get('monthlyPaymentINR'),
+                extraction_data.get('downPaymentINR'),
+                extraction_data.get('residualValueINR'),
+                extraction_data.get('annualMileageKm'),
+                extraction_data.get('earlyTerminationLevel'),
+                extraction_data.get('purchaseOptionStatus'),
+                extraction_data.get('maintenanceType'),
+                extraction_data.get('warrantyType'),
+                extraction_data.get('penaltyLevel'),
+                junk_fees_str,
+                score, 
+                datetime.now().isoformat()
+            ))
+            conn.execute(
+                "INSERT INTO contract_texts (contract_id, codec, body) VALUES (?, ?, ?)",
+                (cursor.lastrowid, TEXT_CODEC, pack_text(contract_text or ""))
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            file_name, 
-            contract_text,
-            extraction_data.get('make'),
-            extraction_data.get('model'),
-            extraction_data.get('year'),
-            extraction_data.get('vin'),
-            extraction_data.get('aprPercent'),
-            extraction_data.get('leaseTermMonths'),
-            extraction_data.get('monthlyPaymentINR'),
-            extraction_data.get('downPaymentINR'),
-            extraction_data.get('residualValueINR'),
-            extraction_data.get('annualMileageKm'),
-            extraction_data.get('earlyTerminationLevel'),
-            extraction_data.get('purchaseOptionStatus'),
-            extraction_data.get('maintenanceType'),
-            extraction_data.get('warrantyType'),
-            extraction_data.get('penaltyLevel'),
-            junk_fees_str,
-            score, 
-            datetime.now().isoformat()
-        ))
-
-        new_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return str(new_id)
+
+        return str(cursor.lastrowid)
 
     except Exception as e:
         logger.error(f"❌ DATABASE SAVE ERROR: {e}")
         return None
 
-def get_contract_context(identifier: str):
+# Largest contract ID any backend stores (Postgres INTEGER). Longer digit
+# strings can only be filenames, and would overflow the ID lookup.
+MAX_CONTRACT_ID = 2**31 - 1
+
+def parse_contract_id(identifier):
+    """Returns identifier as a contract ID if it can be one, else None."""
+    identifier = str(identifier)
+    if identifier.isascii() and identifier.isdigit() and 0 < int(identifier) <= MAX_CONTRACT_ID:
+        return int(identifier)
+    return None
+
+def find_contract_row(conn, identifier: str):
+    """
+    Looks a contract up by ID (if numeric) or by filename, newest first.
+    Two separate indexed queries rather than "id = ? OR file_name = ?",
+    which SQLite can only answer with a scan. A numeric identifier that
+    matches no ID is still tried as a filename.
+    """
+    contract_id = parse_contract_id(identifier)
+    row = None
+    if contract_id is not None:
+        row = conn.execute(_CONTRACT_BY_ID, (contract_id,)).fetchone()
+    if row is None:
+        row = conn.execute(_CONTRACT_BY_FILE_NAME, (str(identifier),)).fetchone()
+    return row
+
+def get_contract_by_id(contract_id: int, include_text: bool = False):
+    """Returns one contract's structured fields (plus "contract_text" if asked), or None."""
+    with db_connection() as conn:
+        row = conn.execute(_CONTRACT_BY_ID, (contract_id,)).fetchone()
+        return _with_text(conn, row, include_text)
+
+def get_contract_by_filename(file_name: str, include_text: bool = False):
+    """Returns the newest contract uploaded under file_name, or None."""
+    with db_connection() as conn:
+        row = conn.execute(_CONTRACT_BY_FILE_NAME, (file_name,)).fetchone()
+        return _with_text(conn, row, include_text)
+
+def list_contracts(limit: int = 50, offset: int = 0):
+    """Returns contracts newest first, without their OCR text."""
+    with db_connection() as conn:
+        rows = conn.execute(
+            f"SELECT {_CONTRACT_COLUMNS} FROM contracts ORDER BY id DESC LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+def _with_text(conn, row, include_text: bool):
+    if not row:
+        return None
+    contract = dict(row)
+    if include_text:
+        contract["contract_text"] = _load_text(conn, row["id"])
+    return contract
+
+def find_contract(identifier: str, include_text: bool = False):
+    """Like get_contract_context, but lets database errors propagate."""
+    with db_connection() as conn:
+        return _with_text(conn, find_contract_row(conn, identifier), include_text)
+
+def get_contract_context(identifier: str, include_text: bool = False):
     """
     Fetches context by ID (if numeric) or Filename (if string).
     This prevents the 500 error when the frontend passes a filename.
+    The OCR text is only loaded (as "contract_text") when include_text is set.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if str(identifier).isdigit():
-            cursor.execute("SELECT * FROM contracts WHERE id = ?", (identifier,))
-        else:
-            cursor.execute("SELECT * FROM contracts WHERE file_name = ? ORDER BY id DESC LIMIT 1", (identifier,))
-            
-        row = cursor.fetchone()
-        conn.close()
-
-        return dict(row) if row else None
+        return find_contract(identifier, include_text)
     except Exception as e:
         logger.error(f"❌ DATABASE RETRIEVAL ERROR: {e}")
         return None
 
+def _load_text(conn, contract_id: int) -> str:
+    row = conn.execute(
+        "SELECT codec, body FROM contract_texts WHERE contract_id = ?", (contract_id,)
+    ).fetchone()
+    return unpack_text(row["codec"], row["body"]) if row else ""
+
+def get_contract_text(contract_id: int) -> str:
+    """Returns a contract's full OCR text, or "" if none is stored."""
+    try:
+        with db_connection() as conn:
+            return _load_text(conn, contract_id)
+    except Exception as e:
+        logger.error(f"❌ CONTRACT TEXT RETRIEVAL ERROR: {e}")
+        return ""
+
+def get_contract_analysis(contract_id: int, analysis_version: str):
+    """Returns the stored deep analysis for a contract, or None if missing or from another version."""
+    try:
+        with db_connection() as conn:
+            row = conn.execute(
+                "SELECT analysis_json FROM contract_analysis WHERE contract_id = ? AND analysis_version = ?",
+                (contract_id, analysis_version)
+            ).fetchone()
+        return json.loads(row["analysis_json"]) if row else None
+    except Exception as e:
+        logger.error(f"❌ ANALYSIS RETRIEVAL ERROR: {e}")
+        return None
+
+def save_contract_analysis(contract_id: int, analysis_version: str, analysis: dict):
+    """Stores (or replaces) the deep analysis for a contract."""
+    try:
+        with db_connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO contract_analysis (contract_id, analysis_version, analysis_json, created_at)
+                VALUES (?, ?, ?, ?)
+            """, (contract_id, analysis_version, json.dumps(analysis), datetime.now().isoformat()))
+    except Exception as e:
+        logger.error(f"❌ ANALYSIS SAVE ERROR: {e}")
+
 if __name__ == "__main__":
     init_db()
 
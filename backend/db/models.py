@@ -1,32 +1,58 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.types import JSON as JSONType
 from datetime import datetime
 
 from .database import Base
 
+# Mirrors the tables db_helper keeps in ocr.db, so either backend can serve
+# the same ContractRecord. Attribute names match the SQLite column names.
+
 
 class Contract(Base):
     __tablename__ = "contracts"
+    # Latest contract for a filename is one index seek, as in SQLite
+    __table_args__ = (Index("idx_contracts_file_name_id", "file_name", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    file_name = Column(String, nullable=False)
+    score = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    make = Column(String, nullable=True)
+    model = Column(String, nullable=True)
+    year = Column(Integer, nullable=True)
+    vin = Column(String, nullable=True)
+    aprPercent = Column(Float, nullable=True)
+    leaseTermMonths = Column(Integer, nullable=True)
+    monthlyPaymentINR = Column(Float, nullable=True)
+    downPaymentINR = Column(Float, nullable=True)
+    residualValueINR = Column(Float, nullable=True)
+    annualMileageKm = Column(Integer, nullable=True)
+    earlyTerminationLevel = Column(String, nullable=True)
+    purchaseOptionStatus = Column(String, nullable=True)
+    maintenanceType = Column(String, nullable=True)
+    warrantyType = Column(String, nullable=True)
+    penaltyLevel = Column(String, nullable=True)
+    junk_fees = Column(Text, nullable=True)
+
+
+class ContractText(Base):
+    """Raw OCR text, kept off the contracts row. Postgres compresses it out of line (TOAST)."""
+    __tablename__ = "contract_texts"
 
-    id = Column(Integer, primary_key=True, index=True)
-    file_id = Column(String, unique=True, index=True, nullable=False)
-    filename = Column(String, nullable=False)
-    s3_path = Column(String, nullable=True)
-    text_path = Column(String, nullable=True)
-    raw_text = Column(Text, nullable=True)
-    ingested_at = Column(DateTime, default=datetime.utcnow)
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    text = Column(Text, nullable=False)
 
 
-# Use JSONB if on Postgres, otherwise regular JSON type
-JSONColumn = JSONB if hasattr(JSONB, "__module__") else JSONType
+# JSONB on Postgres, plain JSON anywhere else
+JSONColumn = JSONType().with_variant(JSONB(), "postgresql")
 
 
 class ContractAnalysis(Base):
     __tablename__ = "contract_analysis"
 
-    id = Column(Integer, primary_key=True, index=True)
-    contract_id = Column(Integer, ForeignKey("contracts.id"), nullable=False, index=True)
-    file_id = Column(String, index=True, nullable=False)
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    analysis_version = Column(String, nullable=False)
     analysis_json = Column(JSONColumn, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
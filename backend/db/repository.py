@@ -0,0 +1,125 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, TypedDict
+
+from app.core.config import get_settings
+from app.core.executors import run_db
+from db import db_helper
+
+
+class ContractRecord(TypedDict, total=False):
+    """One stored contract as the routes see it. contract_text is only present when requested."""
+    id: int
+    file_name: str
+    score: Optional[int]
+    created_at: Optional[str]
+    make: Optional[str]
+    model: Optional[str]
+    year: Optional[int]
+    vin: Optional[str]
+    aprPercent: Optional[float]
+    leaseTermMonths: Optional[int]
+    monthlyPaymentINR: Optional[float]
+    downPaymentINR: Optional[float]
+    residualValueINR: Optional[float]
+    annualMileageKm: Optional[int]
+    earlyTerminationLevel: Optional[str]
+    purchaseOptionStatus: Optional[str]
+    maintenanceType: Optional[str]
+    warrantyType: Optional[str]
+    penaltyLevel: Optional[str]
+    junk_fees: Optional[str]
+    contract_text: str
+
+
+class ContractRepository(ABC):
+    """Async access to stored contracts and their deep analyses."""
+
+    @abstractmethod
+    def init_schema(self):
+        """Creates or migrates tables and indexes. Called once at startup."""
+
+    @abstractmethod
+    async def save(self, file_name: str, contract_text: str, extraction_data: Dict[str, Any], score: int = 0) -> Optional[str]:
+        """Stores a contract and returns its new ID as a string, or None if the write failed."""
+
+    @abstractmethod
+    async def get_by_id(self, contract_id: int, include_text: bool = False) -> Optional[ContractRecord]:
+        ...
+
+    @abstractmethod
+    async def get_by_filename(self, file_name: str, include_text: bool = False) -> Optional[ContractRecord]:
+        """Returns the newest contract uploaded under file_name."""
+
+    async def find(self, identifier: str, include_text: bool = False) -> Optional[ContractRecord]:
+        """Looks up by ID when identifier is numeric, falling back to filename."""
+        contract = None
+        contract_id = db_helper.parse_contract_id(identifier)
+        if contract_id is not None:
+            contract = await self.get_by_id(contract_id, include_text)
+        if contract is None:
+            contract = await self.get_by_filename(str(identifier), include_text)
+        return contract
+
+    @abstractmethod
+    async def list(self, limit: int = 50, offset: int = 0) -> List[ContractRecord]:
+        """Returns contracts newest first, without their OCR text."""
+
+    @abstractmethod
+    async def get_text(self, contract_id: int) -> str:
+        ...
+
+    @abstractmethod
+    async def get_analysis(self, contract_id: int, analysis_version: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def save_analysis(self, contract_id: int, analysis_version: str, analysis: Dict[str, Any]):
+        ...
+
+
+class SQLiteContractRepository(ContractRepository):
+    """
+    The local ocr.db through db_helper. Calls run on the DB thread pool,
+    each thread reusing its own WAL-mode connection, so disk I/O never
+    runs on the event loop.
+    """
+
+    def init_schema(self):
+        db_helper.init_db()
+
+    async def save(self, file_name, contract_text, extraction_data, score=0):
+        return await run_db(db_helper.save_contract_to_db, file_name, contract_text, extraction_data, score)
+
+    async def get_by_id(self, contract_id, include_text=False):
+        return await run_db(db_helper.get_contract_by_id, contract_id, include_text)
+
+    async def get_by_filename(self, file_name, include_text=False):
+        return await run_db(db_helper.get_contract_by_filename, file_name, include_text)
+
+    async def find(self, identifier, include_text=False):
+        # One hop to the pool instead of up to two
+        return await run_db(db_helper.find_contract, identifier, include_text)
+
+    async def list(self, limit=50, offset=0):
+        return await run_db(db_helper.list_contracts, limit, offset)
+
+    async def get_text(self, contract_id):
+        return await run_db(db_helper.get_contract_text, contract_id)
+
+    async def get_analysis(self, contract_id, analysis_version):
+        return await run_db(db_helper.get_contract_analysis, contract_id, analysis_version)
+
+    async def save_analysis(self, contract_id, analysis_version, analysis):
+        await run_db(db_helper.save_contract_analysis, contract_id, analysis_version, analysis)
+
+
+@lru_cache()
+def get_contract_repository() -> ContractRepository:
+    """The storage backend chosen by STORAGE_BACKEND, shared by every route."""
+    settings = get_settings()
+    if settings.STORAGE_BACKEND == "postgres":
+        # Imported here so SQLite dev setups don't need SQLAlchemy or a driver
+        from db.sql_repository import SQLAlchemyContractRepository
+        return SQLAlchemyContractRepository.from_settings(settings)
+    return SQLiteContractRepository()
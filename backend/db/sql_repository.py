@@ -0,0 +1,192 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.executors import run_db
+from db.database import Base, SessionLocal, configure, make_engine
+from db.db_helper import junk_fees_text, parse_contract_id
+from db.models import Contract, ContractAnalysis, ContractText
+from db.repository import ContractRecord, ContractRepository
+
+logger = logging.getLogger(__name__)
+
+_FIELD_COLUMNS = [
+    column for column in Contract.__table__.columns
+    if column.name not in ("id", "file_name", "score", "created_at")
+]
+
+
+def coerce_field(column, value: Any) -> Any:
+    """
+    Fits a value to its column type. LLM output (and SQLite's loose typing)
+    can put "2023", "5.5%" or "N/A" in numeric fields; Postgres rejects
+    those, so numbers are parsed and anything unparseable becomes NULL.
+    """
+    if value is None or value == "":
+        return None
+    python_type = column.type.python_type
+    if python_type is str:
+        return value if isinstance(value, str) else str(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return python_type(value)
+    try:
+        number = float(str(value).replace(",", "").strip().rstrip("%"))
+    except ValueError:
+        return None
+    return int(number) if python_type is int else number
+
+
+def contract_values(extraction_data: Dict[str, Any]) -> Dict[str, Any]:
+    values = {column.name: coerce_field(column, extraction_data.get(column.name)) for column in _FIELD_COLUMNS}
+    values["junk_fees"] = junk_fees_text(extraction_data.get("junk_fees"))
+    return values
+
+
+def clean_text(text: Optional[str]) -> str:
+    # Postgres text columns cannot hold NUL, which OCR output occasionally contains
+    return (text or "").replace("\x00", "")
+
+
+def _record(contract: Contract) -> ContractRecord:
+    record = {column.name: getattr(contract, column.name) for column in Contract.__table__.columns}
+    if record["created_at"] is not None:
+        record["created_at"] = record["created_at"].isoformat()
+    return record
+
+
+class SQLAlchemyContractRepository(ContractRepository):
+    """
+    Contracts in a shared SQL database (Postgres in production) so several
+    API replicas see the same data. Sessions come from the engine's bounded
+    pool and run on the DB thread pool, like the SQLite backend.
+    """
+
+    def __init__(self, engine):
+        self.engine = configure(engine)
+
+    @classmethod
+    def from_settings(cls, settings) -> "SQLAlchemyContractRepository":
+        return cls(make_engine(
+            settings.DATABASE_URL,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+        ))
+
+    def init_schema(self):
+        logger.info(f"Checking database at: {self.engine.url.render_as_string(hide_password=True)}")
+        Base.metadata.create_all(self.engine)
+        logger.info("✅ Database schema is up to date.")
+
+    # --- Blocking implementations, run via run_db ---
+
+    def _save(self, file_name, contract_text, extraction_data, score):
+        try:
+            with SessionLocal.begin() as session:
+                contract = Contract(
+                    file_name=file_name,
+                    score=coerce_field(Contract.__table__.c.score, score),
+                    created_at=datetime.now(),
+                    **contract_values(extraction_data),
+                )
+                session.add(contract)
+                session.flush()
+                session.add(ContractText(contract_id=contract.id, text=clean_text(contract_text)))
+                return str(contract.id)
+        except SQLAlchemyError as e:
+            logger.error(f"❌ DATABASE SAVE ERROR: {e}")
+            return None
+
+    def _first(self, statement, include_text: bool) -> Optional[ContractRecord]:
+        with SessionLocal() as session:
+            contract = session.scalars(statement).first()
+            if contract is None:
+                return None
+            record = _record(contract)
+            if include_text:
+                record["contract_text"] = self._load_text(session, contract.id)
+            return record
+
+    def _get_by_id(self, contract_id, include_text):
+        return self._first(select(Contract).where(Contract.id == contract_id), include_text)
+
+    def _get_by_filename(self, file_name, include_text):
+        statement = select(Contract).where(Contract.file_name == file_name).order_by(Contract.id.desc()).limit(1)
+        return self._first(statement, include_text)
+
+    def _find(self, identifier, include_text):
+        contract = None
+        contract_id = parse_contract_id(identifier)
+        if contract_id is not None:
+            contract = self._get_by_id(contract_id, include_text)
+        return contract or self._get_by_filename(str(identifier), include_text)
+
+    def _list(self, limit, offset):
+        with SessionLocal() as session:
+            statement = select(Contract).order_by(Contract.id.desc()).limit(limit).offset(offset)
+            return [_record(contract) for contract in session.scalars(statement)]
+
+    @staticmethod
+    def _load_text(session, contract_id) -> str:
+        row = session.get(ContractText, contract_id)
+        return row.text if row else ""
+
+    def _get_text(self, contract_id):
+        try:
+            with SessionLocal() as session:
+                return self._load_text(session, contract_id)
+        except SQLAlchemyError as e:
+            logger.error(f"❌ CONTRACT TEXT RETRIEVAL ERROR: {e}")
+            return ""
+
+    def _get_analysis(self, contract_id, analysis_version):
+        try:
+            with SessionLocal() as session:
+                row = session.get(ContractAnalysis, contract_id)
+                return row.analysis_json if row and row.analysis_version == analysis_version else None
+        except SQLAlchemyError as e:
+            logger.error(f"❌ ANALYSIS RETRIEVAL ERROR: {e}")
+            return None
+
+    def _save_analysis(self, contract_id, analysis_version, analysis):
+        try:
+            with SessionLocal.begin() as session:
+                session.merge(ContractAnalysis(
+                    contract_id=contract_id,
+                    analysis_version=analysis_version,
+                    analysis_json=analysis,
+                    created_at=datetime.now(),
+                ))
+        except SQLAlchemyError as e:
+            logger.error(f"❌ ANALYSIS SAVE ERROR: {e}")
+
+    # --- ContractRepository ---
+
+    async def save(self, file_name, contract_text, extraction_data, score=0):
+        return await run_db(self._save, file_name, contract_text, extraction_data, score)
+
+    async def get_by_id(self, contract_id, include_text=False):
+        return await run_db(self._get_by_id, contract_id, include_text)
+
+    async def get_by_filename(self, file_name, include_text=False):
+        return await run_db(self._get_by_filename, file_name, include_text)
+
+    async def find(self, identifier, include_text=False):
+        return await run_db(self._find, identifier, include_text)
+
+    async def list(self, limit=50, offset=0) -> List[ContractRecord]:
+        return await run_db(self._list, limit, offset)
+
+    async def get_text(self, contract_id):
+        return await run_db(self._get_text, contract_id)
+
+    async def get_analysis(self, contract_id, analysis_version):
+        return await run_db(self._get_analysis, contract_id, analysis_version)
+
+    async def save_analysis(self, contract_id, analysis_version, analysis):
+        await run_db(self._save_analysis, contract_id, analysis_version, analysis)
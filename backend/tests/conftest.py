@@ -0,0 +1,36 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# Tests import app.* and db.* the way main.py does, from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import db_helper  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """db_helper pointed at a fresh database file, with its own per-thread connections."""
+    monkeypatch.setattr(db_helper, "DB_PATH", str(tmp_path / "ocr.db"))
+    monkeypatch.setattr(db_helper, "_local", threading.local())
+    db_helper.init_db()
+    return db_helper
+
+
+@pytest.fixture
+def upload_client(tmp_path):
+    """A TestClient for the upload routes, saving into tmp_path with a 1 MB limit."""
+    upload = pytest.importorskip("app.api.upload")
+    fastapi = pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")  # TestClient
+    from fastapi.testclient import TestClient
+
+    from app.core.config import get_settings
+
+    settings = get_settings().model_copy(update={"UPLOAD_DIR": str(tmp_path), "UPLOAD_MAX_MB": 1})
+    app = fastapi.FastAPI()
+    app.include_router(upload.router, prefix="/api")
+    app.dependency_overrides[get_settings] = lambda: settings
+    return TestClient(app)
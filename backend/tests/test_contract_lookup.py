@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from db import db_helper
+
+
+def _save(db, file_name, **fields):
+    return int(db.save_contract_to_db(file_name, f"text of {file_name}", fields, score=50))
+
+
+def test_find_contract_by_id_then_filename(sqlite_db):
+    first = _save(sqlite_db, "lease.pdf", make="Tata")
+    latest = _save(sqlite_db, "lease.pdf", make="Honda")
+
+    assert sqlite_db.find_contract(str(first))["make"] == "Tata"
+    assert sqlite_db.find_contract("lease.pdf")["id"] == latest
+    assert sqlite_db.find_contract("missing.pdf") is None
+
+
+def test_numeric_filename_falls_back_to_filename_lookup(sqlite_db):
+    contract_id = _save(sqlite_db, "123")
+    assert sqlite_db.find_contract("123")["id"] == contract_id
+
+
+@pytest.mark.parametrize("identifier", ["99999999999", "99999999999999999999", "0", "²"])
+def test_out_of_range_ids_are_treated_as_filenames(sqlite_db, identifier):
+    assert db_helper.parse_contract_id(identifier) is None
+    contract_id = _save(sqlite_db, identifier)
+    assert sqlite_db.find_contract(identifier)["id"] == contract_id
+
+
+def test_structured_lookup_leaves_text_out(sqlite_db):
+    contract_id = _save(sqlite_db, "lease.pdf")
+    assert "contract_text" not in sqlite_db.find_contract("lease.pdf")
+    assert sqlite_db.find_contract("lease.pdf", include_text=True)["contract_text"] == "text of lease.pdf"
+    assert sqlite_db.get_contract_text(contract_id) == "text of lease.pdf"
+
+
+def test_sqlalchemy_repository_over_large_id_falls_back_to_filename(tmp_path):
+    pytest.importorskip("sqlalchemy")
+    pytest.importorskip("pydantic_settings")
+    from db.database import make_engine
+    from db.sql_repository import SQLAlchemyContractRepository
+
+    repo = SQLAlchemyContractRepository(make_engine(f"sqlite:///{tmp_path / 'contracts.db'}"))
+    repo.init_schema()
+
+    async def run():
+        saved = await repo.save("99999999999999999999", "text", {"make": "Tata"}, 50)
+        found = await repo.find("99999999999999999999")
+        assert found["id"] == int(saved)
+        assert await repo.find("99999999999") is None
+
+    asyncio.run(run())
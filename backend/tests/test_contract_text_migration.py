@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db import db_helper
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """An ocr.db in the old layout, with OCR text inline in contracts.contract_text."""
+    path = str(tmp_path / "ocr.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE contracts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_name TEXT,
+                contract_text TEXT,
+                score INTEGER,
+                created_at TEXT,
+                make TEXT
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO contracts (file_name, contract_text, score, make) VALUES (?, ?, ?, ?)",
+            [("a.pdf", "First lease text", 70, "Honda"), ("b.pdf", "Second lease text " * 200, 55, "Tata")],
+        )
+    conn.close()
+    monkeypatch.setattr(db_helper, "DB_PATH", path)
+    monkeypatch.setattr(db_helper, "_local", threading.local())
+    return path
+
+
+def test_init_db_moves_inline_text_into_contract_texts(legacy_db):
+    db_helper.init_db()
+
+    with sqlite3.connect(legacy_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM contracts WHERE contract_text IS NOT NULL").fetchone()[0] == 0
+        stored = conn.execute("SELECT contract_id, codec FROM contract_texts ORDER BY contract_id").fetchall()
+    conn.close()
+    assert stored == [(1, db_helper.TEXT_CODEC), (2, db_helper.TEXT_CODEC)]
+
+    assert db_helper.get_contract_text(1) == "First lease text"
+    assert db_helper.get_contract_text(2) == "Second lease text " * 200
+
+
+def test_migrated_contracts_are_found_with_their_text(legacy_db):
+    db_helper.init_db()
+
+    contract = db_helper.find_contract("b.pdf", include_text=True)
+    assert contract["id"] == 2
+    assert contract["make"] == "Tata"
+    assert contract["contract_text"] == "Second lease text " * 200
+    assert "contract_text" not in db_helper.find_contract("1")
+
+
+def test_init_db_is_idempotent(legacy_db):
+    db_helper.init_db()
+    new_id = db_helper.save_contract_to_db("c.pdf", "Third lease text", {"make": "Kia"}, 60)
+    db_helper.init_db()
+
+    assert db_helper.get_contract_text(1) == "First lease text"
+    assert db_helper.get_contract_text(int(new_id)) == "Third lease text"
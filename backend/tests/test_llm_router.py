@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+from app.services import llm_router  # noqa: E402
+from app.services.llm_router import LLMUnavailableError  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def router(monkeypatch):
+    monkeypatch.setattr(llm_router, "_stats", {})
+    monkeypatch.setattr(llm_router, "is_configured", lambda provider: True)
+    monkeypatch.setattr(llm_router.settings, "LLM_ROUTES", {"test": ["openrouter", "groq"]})
+    return llm_router
+
+
+async def _fail():
+    raise RuntimeError("provider down")
+
+
+def _returning(value, delay=0.0):
+    async def attempt():
+        await asyncio.sleep(delay)
+        return value
+    return attempt
+
+
+def _streaming(*pieces, error=None):
+    async def attempt():
+        for piece in pieces:
+            yield piece
+        if error:
+            raise error
+    return attempt
+
+
+async def _collect(stream):
+    return [piece async for piece in stream]
+
+
+def test_call_fails_over_to_next_provider():
+    result = asyncio.run(llm_router.call("test", {"openrouter": _fail, "groq": _returning("ok")}))
+
+    assert result == "ok"
+    stats = llm_router.router_metrics()["test"]
+    assert stats["openrouter"]["failures"] == 1
+    assert stats["groq"]["calls"] == 1 and stats["groq"]["failures"] == 0
+
+
+def test_call_raises_when_every_provider_fails():
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(llm_router.call("test", {"openrouter": _fail, "groq": _fail}))
+
+
+def test_failed_provider_is_ranked_last():
+    asyncio.run(llm_router.call("test", {"openrouter": _fail, "groq": _returning("ok")}))
+    assert llm_router.rank_providers("test", ["openrouter", "groq"]) == ["groq", "openrouter"]
+
+
+def test_hedged_call_returns_the_faster_provider(monkeypatch):
+    monkeypatch.setattr(llm_router.settings, "LLM_TIMEOUT_SECONDS", 5.0)
+    monkeypatch.setattr(llm_router.settings, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(llm_router, "_hedge_delay", lambda task, provider: 0.05)
+
+    started = time.perf_counter()
+    result = asyncio.run(llm_router.call(
+        "test", {"openrouter": _returning("slow", delay=5), "groq": _returning("fast")}, hedge=True
+    ))
+
+    assert result == "fast"
+    assert time.perf_counter() - started < 1
+
+
+def test_stream_fails_over_before_first_chunk():
+    attempts = {"openrouter": _streaming(error=RuntimeError("down")), "groq": _streaming("a", "b")}
+    assert asyncio.run(_collect(llm_router.stream("test", attempts))) == ["a", "b"]
+
+
+def test_stream_fails_over_on_empty_stream():
+    attempts = {"openrouter": _streaming("", ""), "groq": _streaming("a")}
+
+    assert asyncio.run(_collect(llm_router.stream("test", attempts))) == ["a"]
+    assert llm_router.router_metrics()["test"]["openrouter"]["failures"] == 1
+
+
+def test_stream_error_after_first_chunk_is_raised_and_counted_once():
+    attempts = {"openrouter": _streaming("a", error=RuntimeError("cut off")), "groq": _streaming("b")}
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(_collect(llm_router.stream("test", attempts)))
+
+    stats = llm_router.router_metrics()["test"]
+    assert stats["openrouter"]["calls"] == 1
+    assert stats["openrouter"]["failures"] == 0
+    assert stats["groq"]["calls"] == 0
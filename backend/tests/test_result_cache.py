@@ -0,0 +1,56 @@
+import sqlite3
+import time
+
+from app.services.result_cache import SQLiteResultCache
+
+
+def _cache(tmp_path, **kwargs):
+    return SQLiteResultCache(str(tmp_path / "cache.db"), "results", max_bytes=kwargs.pop("max_bytes", 1 << 20), **kwargs)
+
+
+def test_round_trip_reuses_one_connection_per_thread(tmp_path):
+    cache = _cache(tmp_path)
+    cache.put("a", {"value": 1})
+    conn = cache._local.conn
+
+    assert cache.get("a") == {"value": 1}
+    assert cache.get("missing") is None
+    assert cache._local.conn is conn
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = _cache(tmp_path, ttl_seconds=60)
+    cache.put("a", {"value": 1})
+    with cache._connection() as conn:
+        conn.execute("UPDATE results SET created_at = ?", (time.time() - 120,))
+
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path):
+    cache = _cache(tmp_path, max_bytes=40)
+    cache.put("old", "x" * 15)
+    cache.put("used", "y" * 15)
+    with cache._connection() as conn:
+        conn.execute("UPDATE results SET last_access = last_access - 100 WHERE cache_key = 'old'")
+    cache.get("used")
+    cache.put("new", "z" * 15)
+
+    assert cache.get("old") is None
+    assert cache.get("used") == "y" * 15
+    assert cache.get("new") == "z" * 15
+
+
+def test_failed_write_rolls_back_and_cache_keeps_working(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+
+    def broken_evict(conn):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(cache, "_evict", broken_evict)
+    cache.put("a", {"value": 1})
+    assert cache.get("a") is None
+
+    monkeypatch.undo()
+    cache.put("a", {"value": 2})
+    assert cache.get("a") == {"value": 2}
@@ -0,0 +1,94 @@
+import asyncio
+
+from app.core.singleflight import SingleFlight
+
+
+def _counting(calls, release, value="done"):
+    async def work():
+        calls.append(1)
+        await release.wait()
+        return value
+    return work
+
+
+def _returning(value):
+    async def work():
+        return value
+    return work
+
+
+def test_concurrent_calls_share_one_run():
+    async def scenario():
+        flight, calls, release = SingleFlight("test"), [], asyncio.Event()
+        waiters = [asyncio.create_task(flight.do("k", _counting(calls, release))) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*waiters), calls, flight
+
+    results, calls, flight = asyncio.run(scenario())
+    assert results == ["done"] * 3
+    assert len(calls) == 1
+    assert flight.coalesced == 2
+    assert flight._inflight == {}
+
+
+def test_one_waiter_cancelling_leaves_the_others_running():
+    async def scenario():
+        flight, calls, release = SingleFlight("test"), [], asyncio.Event()
+        first = asyncio.create_task(flight.do("k", _counting(calls, release)))
+        second = asyncio.create_task(flight.do("k", _counting(calls, release)))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await second
+
+    first, result = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result == "done"
+
+
+def test_work_is_cancelled_when_the_last_waiter_leaves():
+    async def scenario():
+        flight, release = SingleFlight("test"), asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await release.wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.create_task(flight.do("k", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+            await asyncio.sleep(0)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return flight
+
+    flight = asyncio.run(scenario())
+    assert flight._inflight == {}
+    assert flight._waiters == {}
+
+
+def test_exception_reaches_every_waiter_and_key_is_released():
+    async def scenario():
+        flight, release = SingleFlight("test"), asyncio.Event()
+
+        async def work():
+            await release.wait()
+            raise ValueError("boom")
+
+        waiters = [asyncio.create_task(flight.do("k", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        retry = await flight.do("k", _returning("again"))
+        return results, retry
+
+    results, retry = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retry == "again"
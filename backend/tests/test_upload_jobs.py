@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+upload_jobs = pytest.importorskip("app.services.upload_jobs")
+
+
+@pytest.fixture(autouse=True)
+def fresh_jobs(monkeypatch):
+    """Each test gets its own queue, workers and job table."""
+    monkeypatch.setattr(upload_jobs, "_jobs", {})
+    monkeypatch.setattr(upload_jobs, "_queue", None)
+    monkeypatch.setattr(upload_jobs, "_workers", [])
+
+
+async def _until_finished(job):
+    while job.status not in upload_jobs.FINISHED:
+        await job.wait_for_change(1)
+
+
+def _run_job(process_contract, monkeypatch):
+    monkeypatch.setattr(upload_jobs, "process_contract", process_contract)
+
+    async def scenario():
+        job = upload_jobs.submit_job("lease.pdf", "lease.pdf")
+        await asyncio.wait_for(_until_finished(job), 5)
+        for worker in upload_jobs._workers:
+            worker.cancel()
+        return job
+
+    return asyncio.run(scenario())
+
+
+def test_job_runs_to_done_with_its_result(monkeypatch):
+    async def process_contract(file_path, filename, content_hash=None, report=None, refresh=False):
+        report("ocr", page=1)
+        return {"contract_id": "1"}
+
+    job = _run_job(process_contract, monkeypatch)
+
+    assert job.result == {"contract_id": "1"}
+    assert [event["stage"] for event in job.events] == ["saved", "ocr", "done"]
+    assert upload_jobs.get_job(job.job_id) is job
+
+
+def test_failed_job_publishes_its_error(monkeypatch):
+    async def process_contract(*args, **kwargs):
+        raise ValueError("No text found in PDF")
+
+    job = _run_job(process_contract, monkeypatch)
+
+    assert job.status == "failed"
+    assert job.events[-1] == {"stage": "failed", "error": "No text found in PDF"}
+    assert job.to_dict()["error"] == "No text found in PDF"
+
+
+def test_submit_raises_when_the_queue_is_full(monkeypatch):
+    async def scenario():
+        # No workers, so nothing drains the one-slot queue
+        monkeypatch.setattr(upload_jobs, "_queue", asyncio.Queue(maxsize=1))
+        monkeypatch.setattr(upload_jobs, "_workers", ["idle"])
+        first = upload_jobs.submit_job("a.pdf", "a.pdf")
+        with pytest.raises(upload_jobs.QueueFullError):
+            upload_jobs.submit_job("b.pdf", "b.pdf")
+        return first
+
+    first = asyncio.run(scenario())
+    assert list(upload_jobs._jobs) == [first.job_id]
+
+
+def test_queue_full_upload_returns_503_and_removes_the_file(upload_client, tmp_path, monkeypatch):
+    def submit_job(*args, **kwargs):
+        raise upload_jobs.QueueFullError("Upload queue is full. Please retry shortly.")
+
+    monkeypatch.setattr(upload_jobs, "submit_job", submit_job)
+    response = upload_client.post("/api/upload/jobs", files={"file": ("lease.pdf", b"%PDF-1.4", "application/pdf")})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+    assert list(tmp_path.iterdir()) == []
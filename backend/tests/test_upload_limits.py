@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+upload_limits = pytest.importorskip("app.core.upload_limits")
+from fastapi import HTTPException  # noqa: E402
+
+LIMIT = 1024
+
+
+def _scope(path="/api/upload", method="POST", content_length=None):
+    headers = [] if content_length is None else [(b"content-length", str(content_length).encode())]
+    return {"type": "http", "method": method, "path": path, "headers": headers}
+
+
+def _receiver(*chunks):
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1} for i, chunk in enumerate(chunks)]
+
+    async def receive():
+        return messages.pop(0)
+    return receive
+
+
+async def _run(scope, receive):
+    """Drives the middleware around an app that drains the body; returns (status, bytes the app read)."""
+    sent, read = [], []
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            read.append(message["body"])
+            if not message.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        sent.append(message)
+
+    await upload_limits.UploadSizeLimitMiddleware(app, max_bytes=LIMIT)(scope, receive, send)
+    return sent[0]["status"], b"".join(read)
+
+
+def test_declared_oversize_body_is_rejected_before_it_is_read():
+    status, read = asyncio.run(_run(_scope(content_length=LIMIT + 1), _receiver(b"x" * (LIMIT + 1))))
+    assert status == 413
+    assert read == b""
+
+
+def test_chunked_body_is_cut_off_once_it_crosses_the_limit():
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(_run(_scope(), _receiver(b"x" * 600, b"x" * 600, b"x" * 600)))
+    assert excinfo.value.status_code == 413
+
+
+def test_body_within_the_limit_passes_through():
+    status, read = asyncio.run(_run(_scope(), _receiver(b"x" * 600, b"x" * 400)))
+    assert status == 200
+    assert len(read) == 1000
+
+
+@pytest.mark.parametrize("scope", [_scope(path="/api/chat"), _scope(method="GET")])
+def test_other_requests_are_not_limited(scope):
+    status, read = asyncio.run(_run(scope, _receiver(b"x" * (LIMIT * 2))))
+    assert status == 200
+    assert len(read) == LIMIT * 2
+
+
+def test_oversize_upload_is_rejected_and_removed(upload_client, tmp_path):
+    response = upload_client.post(
+        "/api/upload/jobs", files={"file": ("lease.pdf", b"x" * (1024 * 1024 + 1), "application/pdf")}
+    )
+
+    assert response.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_same_named_uploads_get_separate_files(upload_client, tmp_path, monkeypatch):
+    from app.services import upload_jobs
+
+    submitted = []
+    monkeypatch.setattr(upload_jobs, "submit_job", lambda path, *args, **kwargs: submitted.append(path) or _Job())
+    for body in (b"first", b"second"):
+        upload_client.post("/api/upload/jobs", files={"file": ("lease.pdf", body, "application/pdf")})
+
+    assert len(set(submitted)) == 2
+    assert sorted(p.read_bytes() for p in tmp_path.iterdir()) == [b"first", b"second"]
+
+
+class _Job:
+    job_id = "job"
+    status = "queued"
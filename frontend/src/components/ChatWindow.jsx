@@ -98,24 +98,30 @@ const ChatWindow = ({ contract, onSendMessage, onUploadSuccess }) => {
         time: new Date().toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" }),
       }, { id: targetId });
 
-      while (true) {
+      // Server-sent events: "token" carries {delta}, then "done" or "error" {message}.
+      // accumulatedText holds the unparsed tail of the byte stream.
+      let finished = false;
+      while (!finished) {
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value, { stream: true });
-        accumulatedText += chunk;
-
-        // Try to parse as JSON or clean the raw stream string
-        try {
-          const parsed = JSON.parse(accumulatedText);
-          displayLines = parsed.assistant_message;
-        } catch (e) {
-          // Regex to strip JSON markers during partial stream
-          displayLines = accumulatedText
-            .replace(/^\{"assistant_message":\s*"/, "") 
-            .replace(/"\}$|",\s*"counter_email_draft".*$/, "") 
-            .replace(/\\n/g, "\n") 
-            .replace(/\\"/g, '"'); 
+        accumulatedText += decoder.decode(value, { stream: true });
+        const frames = accumulatedText.split("\n\n");
+        accumulatedText = frames.pop();
+
+        for (const frame of frames) {
+          let eventName = "message";
+          let data = "";
+          for (const line of frame.split("\n")) {
+            if (line.startsWith("event:")) eventName = line.slice(6).trim();
+            else if (line.startsWith("data:")) data += line.slice(5).trim();
+          }
+          if (!data) continue; // heartbeat comment
+
+          const payload = JSON.parse(data);
+          if (eventName === "token") displayLines += payload.delta;
+          else if (eventName === "error") displayLines += (displayLines ? "\n\n" : "") + payload.message;
+          else if (eventName === "done") finished = true;
         }
 
         onSendMessage({
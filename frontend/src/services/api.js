@@ -160,8 +160,11 @@ export const api = {
     return res.data;
   },
 
-  analyzeContract: async (fileId) => {
-    const res = await apiClient.post(`/contracts/${fileId}/analyze`);
+  // refresh=true reruns the AI analysis instead of reusing the stored one
+  analyzeContract: async (fileId, refresh = false) => {
+    const res = await apiClient.post(`/contracts/${fileId}/analyze`, null, {
+      params: refresh ? { refresh: true } : undefined,
+    });
     return res.data;
   },
 
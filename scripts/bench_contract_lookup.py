@@ -0,0 +1,65 @@
+"""
+Times contract lookups by id and by filename as the contracts table grows.
+
+Builds a throwaway SQLite database with backend's schema and indexes, then
+measures find_contract_row() at each size. With the indexes in place the
+per-lookup latency should stay roughly flat up to 1M rows.
+
+    python scripts/bench_contract_lookup.py [--rows 1000000] [--lookups 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from db import db_helper  # noqa: E402
+
+
+def fill(conn, start, end):
+    conn.executemany(
+        "INSERT INTO contracts (id, file_name, score, created_at) VALUES (?, ?, ?, ?)",
+        ((i, f"contract_{i // 2}.pdf", 50, "2024-01-01T00:00:00") for i in range(start + 1, end + 1)),
+    )
+    conn.commit()
+
+
+def time_lookups(conn, rows, lookups):
+    ids = [str(random.randint(1, rows)) for _ in range(lookups)]
+    names = [f"contract_{random.randint(0, rows // 2)}.pdf" for _ in range(lookups)]
+    results = {}
+    for label, keys in (("by id", ids), ("by filename", names)):
+        started = time.perf_counter()
+        for key in keys:
+            db_helper.find_contract_row(conn, key)
+        results[label] = (time.perf_counter() - started) / lookups * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_helper.DB_PATH = os.path.join(tmp, "bench.db")
+        db_helper.init_db()
+
+        with db_helper.db_connection() as conn:
+            sizes = [n for n in (1_000, 10_000, 100_000, 1_000_000) if n < args.rows] + [args.rows]
+            loaded = 0
+            print(f"{'rows':>10}  {'by id (us)':>12}  {'by filename (us)':>17}")
+            for size in sizes:
+                fill(conn, loaded, size)
+                loaded = size
+                conn.execute("ANALYZE contracts")
+                timings = time_lookups(conn, size, args.lookups)
+                print(f"{size:>10}  {timings['by id']:>12.1f}  {timings['by filename']:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Copies contracts, their OCR text and stored analyses from the local SQLite
+database (backend/db/ocr.db) into the SQL database used with
+STORAGE_BACKEND=postgres.
+
+IDs are preserved, so links the frontend already holds keep working. The
+copy is resumable: contracts whose ID already exists in the target are
+skipped. Both SQLite layouts are read, with the OCR text either inline in
+contracts.contract_text or in contract_texts. The source file is only read.
+
+    python scripts/migrate_sqlite_to_postgres.py [--source backend/db/ocr.db] [--database-url postgresql://...]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from sqlalchemy import func, select, text  # noqa: E402
+
+from db import db_helper  # noqa: E402
+from db.database import DATABASE_URL, Base, make_engine  # noqa: E402
+from db.models import Contract, ContractAnalysis, ContractText  # noqa: E402
+from db.sql_repository import clean_text, coerce_field, contract_values  # noqa: E402
+
+
+def parse_time(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def source_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def load_text(conn, row, has_text_table):
+    if has_text_table:
+        stored = conn.execute(
+            "SELECT codec, body FROM contract_texts WHERE contract_id = ?", (row["id"],)
+        ).fetchone()
+        if stored:
+            return db_helper.unpack_text(stored["codec"], stored["body"])
+    return row["contract_text"] if "contract_text" in row.keys() else ""
+
+
+def copy_contracts(source, target, batch_size):
+    tables = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    has_text_table = "contract_texts" in tables
+    columns = source_columns(source, "contracts")
+
+    with target.connect() as conn:
+        existing = set(conn.scalars(select(Contract.id)))
+
+    copied = skipped = 0
+    last_id = 0
+    while True:
+        rows = source.execute(
+            "SELECT * FROM contracts WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        contracts, texts = [], []
+        for row in rows:
+            if row["id"] in existing:
+                skipped += 1
+                continue
+            fields = {name: row[name] for name in columns if name in db_helper.CONTRACT_FIELDS}
+            contracts.append({
+                "id": row["id"],
+                "file_name": row["file_name"] or "",
+                "score": coerce_field(Contract.__table__.c.score, row["score"]),
+                "created_at": parse_time(row["created_at"]),
+                **contract_values(fields),
+            })
+            texts.append({"contract_id": row["id"], "text": clean_text(load_text(source, row, has_text_table))})
+
+        if contracts:
+            with target.begin() as conn:
+                conn.execute(Contract.__table__.insert(), contracts)
+                conn.execute(ContractText.__table__.insert(), texts)
+            copied += len(contracts)
+            print(f"  contracts: {copied} copied, {skipped} already present (up to id {last_id})")
+
+    return copied, skipped
+
+
+def copy_analyses(source, target):
+    tables = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "contract_analysis" not in tables:
+        return 0
+
+    with target.connect() as conn:
+        contract_ids = set(conn.scalars(select(Contract.id)))
+        existing = set(conn.scalars(select(ContractAnalysis.contract_id)))
+
+    analyses = [
+        {
+            "contract_id": row["contract_id"],
+            "analysis_version": row["analysis_version"],
+            "analysis_json": json.loads(row["analysis_json"]),
+            "created_at": parse_time(row["created_at"]),
+        }
+        for row in source.execute("SELECT * FROM contract_analysis")
+        if row["contract_id"] in contract_ids and row["contract_id"] not in existing
+    ]
+    if analyses:
+        with target.begin() as conn:
+            conn.execute(ContractAnalysis.__table__.insert(), analyses)
+    return len(analyses)
+
+
+def reset_id_sequence(target):
+    # Rows were inserted with explicit IDs; move the serial past them
+    if target.dialect.name != "postgresql":
+        return
+    with target.begin() as conn:
+        max_id = conn.scalar(select(func.max(Contract.id)))
+        if max_id:
+            conn.execute(text("SELECT setval(pg_get_serial_sequence('contracts', 'id'), :max_id)"), {"max_id": max_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--source", default=db_helper.DB_PATH)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        sys.exit(f"Source database not found: {args.source}")
+
+    source = sqlite3.connect(args.source)
+    source.row_factory = sqlite3.Row
+    target = make_engine(args.database_url)
+    Base.metadata.create_all(target)
+
+    print(f"Migrating {args.source} -> {target.url.render_as_string(hide_password=True)}")
+    copied, skipped = copy_contracts(source, target, args.batch_size)
+    analyses = copy_analyses(source, target)
+    reset_id_sequence(target)
+    source.close()
+    print(f"Done: {copied} contracts copied, {skipped} skipped, {analyses} analyses copied.")
+
+
+if __name__ == "__main__":
+    main()